@@ -0,0 +1,385 @@
+# benchmarks.py
+"""Benchmarks for bilingual_flashcards_from_docx
+
+Run all benchmarks:        python benchmarks.py
+Run selected benchmarks:   python benchmarks.py remove_emojis quiz_plan
+Smaller decks, saved:      python benchmarks.py --sizes 10 1000 --output results.json
+Everything at every size:  python benchmarks.py --full
+
+Every run uses synthetic decks, the fake TTS backend and a throwaway cache
+directory, so results only depend on the code and the machine.
+"""
+import argparse
+import atexit
+import functools
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime
+
+# Importing the app outside `streamlit run` logs bare-mode warnings on every
+# session_state access; they are irrelevant here
+from streamlit import logger as streamlit_logger
+streamlit_logger.set_log_level("error")
+
+# Isolate the run before the app reads its configuration
+BENCH_DIR = tempfile.mkdtemp(prefix="flashcards-bench-")
+atexit.register(shutil.rmtree, BENCH_DIR, ignore_errors=True)
+os.environ["FLASHCARDS_CACHE_DIR"] = os.path.join(BENCH_DIR, "cache")
+os.environ["FLASHCARDS_TTS_BACKEND"] = "fake"
+os.environ.pop("FLASHCARDS_METRICS_FILE", None)
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bilingual_flashcards_from_docx.py")
+sys.path.insert(0, os.path.dirname(APP_PATH))
+import bilingual_flashcards_from_docx as app
+
+DOC_PATH = os.path.join(os.path.dirname(APP_PATH), app.doc_path)
+DECK_SIZES = (10, 1000, 50000)
+# Driving the whole UI, and exporting (and caching) ~1 GB of audio for the largest
+# deck, are slow, so these benchmarks skip bigger decks unless run with --full
+APPTEST_MAX_SIZE = 1000
+BULK_ZIP_MAX_SIZE = 1000
+
+# 🕰️ Reference implementation: remove_emojis + whitespace collapsing as they were
+# before the pattern was compiled at import
+def legacy_normalize(text):
+    emoji_pattern = re.compile(
+        "["
+        "\U0001F600-\U0001F64F"
+        "\U0001F300-\U0001F5FF"
+        "\U0001F680-\U0001F6FF"
+        "\U0001F1E0-\U0001F1FF"
+        "\U00002500-\U00002BEF"
+        "\U00002702-\U000027B0"
+        "\U000024C2-\U0001F251"
+        "\U0001f926-\U0001f937"
+        "\U00010000-\U0010ffff"
+        "\u2640-\u2642"
+        "\u2600-\u2B55"
+        "\u200d"
+        "\u23cf"
+        "\u23e9"
+        "\u231a"
+        "\ufe0f"
+        "\u3030"
+        "]+",
+        flags=re.UNICODE
+    )
+    return ' '.join(emoji_pattern.sub(r'', text).split())
+
+def _time_per_call(func, samples, repeat=5, number=200):
+    """Best-of-repeat time per call in microseconds"""
+    timer = timeit.Timer(lambda: [func(text) for text in samples])
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / (number * len(samples)) * 1e6
+
+# 🚫 Emoji removal and whitespace normalization
+def bench_remove_emojis(decks):
+    """Compare the legacy normalizer with the precompiled and memoized versions"""
+    samples = []
+    if os.path.exists(DOC_PATH):
+        for english, arabic, _ in app.load_flashcards(DOC_PATH):
+            samples.extend([english, arabic])
+    samples.extend([
+        "Hello, how are you?",
+        "مَرْحَبًا، كَيْفَ حَالُكَ؟",
+        "Thank you 🙏  very   much ✨",
+    ])
+
+    # The new pipeline must produce exactly what the old one did
+    for text in samples:
+        assert app.normalize_tts_text(text) == legacy_normalize(text), text
+
+    def uncached(text):
+        return ' '.join(app.remove_emojis(text).split())
+
+    app.normalize_tts_text.cache_clear()
+    results = {
+        "samples": {
+            "phrases": len(samples),
+            "legacy_us": _time_per_call(legacy_normalize, samples),
+            "precompiled_us": _time_per_call(uncached, samples),
+            "memoized_us": _time_per_call(app.normalize_tts_text, samples),
+        }
+    }
+    
+    # Whole decks, one pass each: the cost of preparing every phrase for speech
+    for size in decks.sizes:
+        phrases = [text for english, arabic, _ in decks.cards(size) for text in (english, arabic)]
+        results[size] = {
+            "phrases": len(phrases),
+            "legacy_s": _time_once(lambda: [legacy_normalize(text) for text in phrases])[0],
+            "precompiled_s": _time_once(lambda: [uncached(text) for text in phrases])[0],
+        }
+    return results
+
+# 🏗️ Synthetic decks
+SAMPLE_PHRASES = [
+    ("Hello, are you the guide? 👋", "مَرْحَبًا، هَلْ أَنْتَ الْمُرْشِدْ؟", "marHaban, hal anta al-murshid"),
+    ("Yes, I am your guide today 🙂", "نَعَمْ، أَنَا مُرْشِدُكَ الْيَوْمْ", "na‘am, anā murshiduka al-yawm"),
+    ("What places will we visit? 🏛️", "مَا الْأَمَاكِنُ الَّتِي سَنَزُورُهَا؟", "mā al-amākinu allatī sanazūruhā"),
+    ("Thank you very much", "شُكْرًا جَزِيلًا", "shukran jazīlan"),
+]
+
+def make_synthetic_deck(path, num_phrases, seed=0):
+    """Write a .docx with num_phrases distinct flashcard lines plus the noise real documents contain
+
+    Lines are split over several runs, with speaker prefixes, headings, blank lines,
+    line breaks and a table whose paragraphs must be ignored.
+    """
+    from docx import Document
+
+    rng = random.Random(seed)
+    doc = Document()
+    doc.add_heading("Conversation between tourist and guide", level=1)
+    for i in range(num_phrases):
+        english, arabic, translit = SAMPLE_PHRASES[i % len(SAMPLE_PHRASES)]
+        speaker = rng.choice(["Student: ", "Teacher: ", "Tourist: ", ""])
+        paragraph = doc.add_paragraph()
+        paragraph.add_run(f"{speaker}{english} #{i}")
+        paragraph.add_run(" : ")
+        paragraph.add_run(f"[{arabic} {i}]").bold = True
+        paragraph.add_run(f" : {translit} {i}")
+        if i % 97 == 0:
+            paragraph.add_run().add_break()
+        if i % 50 == 0:
+            doc.add_paragraph("")
+            doc.add_paragraph(f"Section {i // 50 + 1}")
+    table = doc.add_table(rows=1, cols=1)
+    table.cell(0, 0).text = "Hidden : [مخفي] : makhfi"
+    doc.save(path)
+    return path
+
+class SyntheticDecks:
+    """Synthetic documents of the requested sizes, written once per run and parsed on demand"""
+
+    def __init__(self, sizes, directory, full=False):
+        self.sizes = sizes
+        self.directory = directory
+        self.full = full
+        self._cards = {}
+
+    def sizes_up_to(self, limit):
+        """The requested sizes no larger than limit, or all of them in a --full run"""
+        return [size for size in self.sizes if self.full or size <= limit]
+
+    def path(self, size):
+        path = os.path.join(self.directory, f"deck_{size}.docx")
+        if not os.path.exists(path):
+            make_synthetic_deck(path, size)
+        return path
+
+    def cards(self, size):
+        if size not in self._cards:
+            self._cards[size] = app.load_flashcards_fast(self.path(size))
+        return self._cards[size]
+
+def _time_once(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+# ⚡ python-docx parser versus the streaming parser
+def bench_parse_docx(decks):
+    """Time load_flashcards against load_flashcards_fast on each synthetic deck"""
+    results = {}
+    for size in decks.sizes:
+        path = decks.path(size)
+        docx_seconds, expected = _time_once(app.load_flashcards, path)
+        fast_seconds, actual = _time_once(app.load_flashcards_fast, path)
+        # The streaming parser must agree exactly
+        assert actual == expected
+        results[size] = {
+            "phrases": len(expected),
+            "python_docx_s": docx_seconds,
+            "streaming_s": fast_seconds,
+            "speedup": docx_seconds / fast_seconds,
+        }
+    
+    if os.path.exists(DOC_PATH):
+        assert app.load_flashcards_fast(DOC_PATH) == app.load_flashcards(DOC_PATH)
+    return results
+
+# 🧩 Quiz options for every card of a deck
+def bench_quiz_plan(decks):
+    """Time building the distractor index and a full Mixed quiz plan, with easy and hard distractors"""
+    results = {}
+    for size in decks.sizes:
+        cards = decks.cards(size)
+        index_seconds, index = _time_once(app.DistractorIndex, cards)
+        rng = random.Random(0)
+        easy_seconds, _ = _time_once(lambda: app.generate_quiz_plan(cards, "Mixed", index, hard=False, rng=rng))
+        hard_seconds, _ = _time_once(lambda: app.generate_quiz_plan(cards, "Mixed", index, hard=True, rng=rng))
+        results[size] = {
+            "questions": len(cards),
+            "index_s": index_seconds,
+            "plan_s": easy_seconds,
+            "hard_plan_s": hard_seconds,
+        }
+    return results
+
+# 🗜️ Bulk "English then Arabic" ZIP export with the fake backend
+def bench_bulk_zip(decks):
+    """Time the bulk export with an empty audio cache, then again with every recording cached"""
+    results = {}
+    for size in decks.sizes_up_to(BULK_ZIP_MAX_SIZE):
+        cards = decks.cards(size)
+        
+        def export():
+            jobs = [functools.partial(app.render_combined_audio, english, arabic) for english, arabic, _ in cards]
+            filenames = [f"flashcard_{i+1:02d}_english_arabic.mp3" for i in range(len(cards))]
+            return app.build_audio_zip(jobs, filenames)
+        
+        cold_seconds, (buffer, written, failures) = _time_once(export)
+        warm_seconds, _ = _time_once(export)
+        assert not failures and written == len(cards)
+        results[size] = {
+            "files": written,
+            "zip_mb": len(buffer.getvalue()) / (1024 * 1024),
+            "cold_s": cold_seconds,
+            "warm_s": warm_seconds,
+        }
+    return results
+
+# 🔎 Search index versus a linear scan
+def linear_search(flashcards, query):
+    """The search box before the index: case-insensitive substring match on every field"""
+    query = query.strip().casefold()
+    return [
+        i for i, (english, arabic, translit) in enumerate(flashcards)
+        if query in english.casefold() or query in arabic or query in translit.casefold()
+    ]
+
+SEARCH_QUERIES = {
+    "word": "guide",
+    "prefix": "plac",
+    "two_words": "guide today",
+    "arabic_plain": "مرشد",  # no diacritics, as typed on most keyboards
+    "transliteration": "murshid",
+    "typo": "pleaces",
+}
+
+def bench_search(decks):
+    """Time building the search index, indexed queries, and the linear scan it replaced"""
+    results = {}
+    for size in decks.sizes:
+        cards = decks.cards(size)
+        build_seconds, index = _time_once(app.SearchIndex, cards)
+        hash_seconds, _ = _time_once(lambda: hash(tuple(cards)))
+        index.search("warm up fuzzy trigrams")
+        result = {"cards": len(cards), "build_s": build_seconds, "deck_hash_ms": hash_seconds * 1000}
+        for name, query in SEARCH_QUERIES.items():
+            matches = index.search(query)
+            timer = timeit.Timer(lambda: index.search(query))
+            repeat = max(1, min(1000, int(0.2 / max(timer.timeit(1), 1e-6))))
+            result[f"{name}_ms"] = min(timer.repeat(repeat=3, number=repeat)) / repeat * 1000
+            result[f"{name}_matches"] = len(matches)
+        result["linear_word_ms"] = _time_once(linear_search, cards, SEARCH_QUERIES["word"])[0] * 1000
+        results[size] = result
+    return results
+
+# 🖥️ Full reruns of the Streamlit app, driven by AppTest
+def _read_tab_timings(metrics_path):
+    """Mean rerun time of each tab function, from the app's Prometheus metrics file"""
+    sums, counts = {}, {}
+    pattern = re.compile(r'^flashcards_duration_seconds_(sum|count)\{function="(show_\w+|rerun)"\} (\S+)$')
+    with open(metrics_path) as f:
+        for line in f:
+            match = pattern.match(line)
+            if match:
+                kind, function, value = match.groups()
+                (sums if kind == "sum" else counts)[function] = float(value)
+    return {f"{function}_mean_s": sums[function] / counts[function] for function in sums if counts.get(function)}
+
+def bench_apptest(decks):
+    """Time a first run, a plain rerun and one interaction per tab"""
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    for size in decks.sizes_up_to(APPTEST_MAX_SIZE):
+        os.environ["FLASHCARDS_DECK"] = decks.path(size)
+        metrics_path = os.path.join(BENCH_DIR, f"metrics_{size}.prom")
+        os.environ["FLASHCARDS_METRICS_FILE"] = metrics_path
+        try:
+            at = AppTest.from_file(APP_PATH, default_timeout=600)
+            steps = [
+                ("first_run_s", lambda: at.run()),
+                ("rerun_s", lambda: at.run()),
+                ("flashcards_play_s", lambda: next(b for b in at.button if (b.key or "").startswith("en_voice_")).click().run()),
+                ("flashcards_search_s", lambda: at.text_input(key="card_search").input("guide").run()),
+                ("quiz_start_s", lambda: next(b for b in at.button if "Start Quiz" in b.label).click().run()),
+                ("bulk_generate_s", lambda: next(b for b in at.button if "Generate Download Package" in b.label).click().run()),
+            ]
+            timings = {}
+            for name, step in steps:
+                timings[name] = _time_once(step)[0]
+                if at.exception:
+                    raise RuntimeError(f"{name}: {at.exception[0].message}")
+            timings.update(_read_tab_timings(metrics_path))
+            results[size] = timings
+        finally:
+            os.environ.pop("FLASHCARDS_DECK", None)
+            os.environ.pop("FLASHCARDS_METRICS_FILE", None)
+    return results
+
+BENCHMARKS = {
+    "remove_emojis": bench_remove_emojis,
+    "parse_docx": bench_parse_docx,
+    "quiz_plan": bench_quiz_plan,
+    "bulk_zip": bench_bulk_zip,
+    "search": bench_search,
+    "apptest": bench_apptest,
+}
+
+def _print_result(result, indent="  "):
+    for key, value in result.items():
+        if isinstance(value, dict):
+            print(f"{indent}{key}:")
+            _print_result(value, indent + "  ")
+        else:
+            print(f"{indent}{key:>26}: {value:.3f}" if isinstance(value, float) else f"{indent}{key:>26}: {value}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run flashcard app benchmarks")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DECK_SIZES), help="synthetic deck sizes in phrases")
+    parser.add_argument("--full", action="store_true", help="also run AppTest and bulk export on decks above 1000 phrases")
+    parser.add_argument("--output", help="write results as JSON to this file, for comparing versions")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    import streamlit
+    decks = SyntheticDecks(args.sizes, os.path.join(BENCH_DIR, "decks"), full=args.full)
+    os.makedirs(decks.directory)
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "sizes": args.sizes,
+        "full": args.full,
+        "results": {},
+    }
+    for name in args.names or BENCHMARKS:
+        result = BENCHMARKS[name](decks)
+        report["results"][name] = result
+        print(f"{name}:")
+        _print_result(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
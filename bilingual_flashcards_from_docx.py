@@ -1,17 +1,101 @@
 # bilingual_flashcards_from_docx.py
-import base64
 import streamlit as st
 from docx import Document
 import re
 from gtts import gTTS
 import io
+import os
 import time
 import random
 import json
+import bisect
+import hashlib
+import collections
+import contextlib
+import functools
+import glob
+import multiprocessing
+import queue
+import shutil
+import sqlite3
+import struct
+import subprocess
+import tempfile
+import threading
+import unicodedata
+import weakref
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
 # 📂 Path to your text document
 doc_path = "Flash Card Text.docx"
+# A single document, a directory of .docx files, or a glob such as "decks/*.docx"
+DECK_SOURCE = os.environ.get("FLASHCARDS_DECK", doc_path)
+# Worker processes used to parse changed documents of a multi-document deck
+DECK_PARSE_WORKERS = int(os.environ.get("FLASHCARDS_PARSE_WORKERS", os.cpu_count() or 2))
+DECK_PARSE_TIMEOUT_SECONDS = 120
+# How often documents are checked for edits, and open sessions for a newer deck (0 = off)
+DECK_WATCH_INTERVAL_SECONDS = float(os.environ.get("FLASHCARDS_WATCH_INTERVAL", 2))
+
+# 🗄️ Shared cache directory (audio is reused by every session and process on the host)
+CACHE_DIR = os.environ.get("FLASHCARDS_CACHE_DIR", ".flashcards_cache")
+AUDIO_CACHE_DIR = os.path.join(CACHE_DIR, "audio")
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("FLASHCARDS_AUDIO_CACHE_MAX_BYTES", 500 * 1024 * 1024))
+DECK_CACHE_DIR = os.path.join(CACHE_DIR, "decks")
+# Bump when parsing rules change so old sidecar files are ignored
+DECK_CACHE_VERSION = 1
+# Spaced-repetition schedules, one per learner name
+REVIEW_DB_PATH = os.environ.get("FLASHCARDS_REVIEW_DB", os.path.join(CACHE_DIR, "reviews.sqlite3"))
+# Audio held in memory for playback: per browser session, and across all sessions of the server
+SESSION_AUDIO_MAX_BYTES = int(os.environ.get("FLASHCARDS_SESSION_AUDIO_MAX_BYTES", 4 * 1024 * 1024))
+SERVER_AUDIO_MAX_BYTES = int(os.environ.get("FLASHCARDS_SERVER_AUDIO_MAX_BYTES", 256 * 1024 * 1024))
+
+# 🗣️ Text-to-speech backend: "gtts", "espeak" or "fake"
+TTS_BACKEND = os.environ.get("FLASHCARDS_TTS_BACKEND", "gtts")
+# Simulated per-request latency for the fake backend (useful for load tests)
+FAKE_TTS_LATENCY_SECONDS = float(os.environ.get("FLASHCARDS_FAKE_TTS_LATENCY", 0))
+
+# 🚦 Protect the TTS service: a token bucket shared by all sessions, and a circuit
+# breaker that stops calling it after repeated failures
+TTS_RATE_PER_SECOND = float(os.environ.get("FLASHCARDS_TTS_RATE", 5))
+TTS_BURST = int(os.environ.get("FLASHCARDS_TTS_BURST", 10))
+# How long a request may queue for a token before it is rejected
+TTS_RATE_WAIT_SECONDS = 5
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30
+
+# 🎚️ Silence inserted between the two languages of a combined recording
+COMBINED_AUDIO_GAP_MS = int(os.environ.get("FLASHCARDS_AUDIO_GAP_MS", 500))
+# ...and between cards of a whole-deck playlist
+PLAYLIST_CARD_GAP_MS = int(os.environ.get("FLASHCARDS_PLAYLIST_GAP_MS", 1500))
+
+# ⚙️ Bulk synthesis scheduling
+BULK_MAX_WORKERS = int(os.environ.get("FLASHCARDS_BULK_WORKERS", 4))
+SYNTH_RETRIES = 3
+SYNTH_BACKOFF_SECONDS = 0.5
+
+# 📝 Quiz options
+QUIZ_NUM_DISTRACTORS = 3
+QUIZ_FALLBACK_OPTIONS = {"ar": ["نَعَم", "لا", "شُكْرًا"], "en": ["Yes", "No", "Thank you"]}
+# Questions prepared in the background ahead of the one being answered
+QUIZ_PREFETCH_AHEAD = 2
+QUIZ_PREFETCH_WORKERS = int(os.environ.get("FLASHCARDS_PREFETCH_WORKERS", 2))
+
+# 📅 Spaced repetition (SM-2)
+SRS_INITIAL_EASE = 2.5
+SRS_MIN_EASE = 1.3
+# Cards answered wrongly come back after this many seconds
+SRS_RELEARN_SECONDS = 10 * 60
+
+# 📈 Performance metrics: Prometheus text file rewritten after every rerun (unset = off)
+METRICS_FILE = os.environ.get("FLASHCARDS_METRICS_FILE")
+METRICS_BUCKETS_SECONDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# 📄 Flashcard pagination
+CARD_PAGE_SIZES = [5, 10, 20, 50]
+DEFAULT_CARD_PAGE_SIZE = 10
 
 # Session state initialization
 if 'audio_playing' not in st.session_state:
@@ -32,110 +116,1748 @@ if 'quiz_flashcards' not in st.session_state:
     st.session_state.quiz_flashcards = []
 if 'quiz_type' not in st.session_state:
     st.session_state.quiz_type = "English to Arabic"
+if 'quiz_directions' not in st.session_state:
+    st.session_state.quiz_directions = []
+if 'quiz_options' not in st.session_state:
+    st.session_state.quiz_options = []
+if 'quiz_prefetch' not in st.session_state:
+    st.session_state.quiz_prefetch = {}
+if 'quiz_listening' not in st.session_state:
+    st.session_state.quiz_listening = False
+if 'quiz_learner' not in st.session_state:
+    st.session_state.quiz_learner = ""
+if 'deck_version' not in st.session_state:
+    st.session_state.deck_version = None
+if 'card_page' not in st.session_state:
+    st.session_state.card_page = 1
+if 'card_page_size' not in st.session_state:
+    st.session_state.card_page_size = DEFAULT_CARD_PAGE_SIZE
+if 'card_search' not in st.session_state:
+    st.session_state.card_search = ""
+
+# 📈 Latency histograms and counters, exported in Prometheus text format
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self, buckets=METRICS_BUCKETS_SECONDS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-th quantile (the largest bound for the overflow bucket)"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms, keyed by metric name and labels"""
+
+    def __init__(self):
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.help = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, help="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.help.setdefault(name, help)
+
+    def observe(self, name, value, help="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+                self.help.setdefault(name, help)
+            self.histograms[key].observe(value)
+
+    def timings(self):
+        """Rows summarising every latency histogram by label, slowest total first"""
+        with self._lock:
+            rows = [
+                {
+                    **dict(labels),
+                    "calls": hist.count,
+                    "total_s": round(hist.sum, 3),
+                    "mean_ms": round(1000 * hist.sum / hist.count, 1) if hist.count else 0,
+                    "p95_ms": round(1000 * hist.quantile(0.95), 1),
+                    "max_ms": round(1000 * hist.max, 1),
+                }
+                for (_, labels), hist in self.histograms.items()
+            ]
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+    def to_prometheus(self, gauges=()):
+        """Text exposition format; gauges is an iterable of (name, help, value) read at export time"""
+        def format_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+        
+        lines = []
+        with self._lock:
+            for metric_type, series in (("counter", self.counters), ("histogram", self.histograms)):
+                for name in sorted({name for name, _ in series}):
+                    lines.append(f"# HELP {name} {self.help.get(name) or name}")
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    for (series_name, labels), value in sorted(series.items()):
+                        if series_name != name:
+                            continue
+                        if metric_type == "counter":
+                            lines.append(f"{name}{format_labels(labels)} {value}")
+                            continue
+                        cumulative = 0
+                        for bound, count in zip(value.buckets, value.counts):
+                            cumulative += count
+                            lines.append(f"{name}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+                        lines.append(f"{name}_bucket{format_labels(labels, [('le', '+Inf')])} {value.count}")
+                        lines.append(f"{name}_sum{format_labels(labels)} {value.sum}")
+                        lines.append(f"{name}_count{format_labels(labels)} {value.count}")
+        for name, help, value in gauges:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+@st.cache_resource
+def get_metrics():
+    """Process-wide metrics registry shared by every session"""
+    return MetricsRegistry()
+
+def record_duration(name, seconds):
+    get_metrics().observe(
+        "flashcards_duration_seconds", seconds,
+        help="Wall time of instrumented functions and reruns", function=name,
+    )
+
+@contextlib.contextmanager
+def track(name):
+    """Record the wall time of the with-block in the flashcards_duration_seconds histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_duration(name, time.perf_counter() - start)
+
+def timed(name):
+    """Decorator form of track(); byte results are also counted in flashcards_output_bytes_total"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track(name):
+                result = func(*args, **kwargs)
+            if isinstance(result, bytes):
+                get_metrics().inc(
+                    "flashcards_output_bytes_total", len(result),
+                    help="Bytes of audio returned by instrumented functions", function=name,
+                )
+            return result
+        return wrapper
+    return decorator
+
+# 🔤 Patterns for a flashcard line: "Student: English : [Arabic] : transliteration"
+SPEAKER_PREFIX_PATTERN = re.compile(r'^(Student|Teacher):\s*')
+ARABIC_BRACKET_PATTERN = re.compile(r'\[(.*?)\]')
+
+# ✂️ Parse one paragraph of the document
+def parse_flashcard_line(text):
+    """Return (english, arabic, translit) for a flashcard paragraph, or None"""
+    text = text.strip()
+    if not text:  # skip empty lines
+        return None
+    
+    # Split by " : " (space-colon-space) to handle the format correctly
+    parts = text.split(" : ")
+    if len(parts) < 3:
+        return None
+    
+    # Extract just the phrase (remove "Student:" or "Teacher:" prefix)
+    english_full = parts[0].strip()
+    english = SPEAKER_PREFIX_PATTERN.sub('', english_full)
+    
+    # Extract Arabic text from [text] format
+    arabic_raw = parts[1].strip()
+    arabic_match = ARABIC_BRACKET_PATTERN.search(arabic_raw)
+    arabic = arabic_match.group(1) if arabic_match else arabic_raw
+    
+    # Get transliteration
+    translit = parts[2].strip()
+    
+    return english, arabic, translit
 
 # 📖 Load text from Word document
+@timed("load_flashcards")
 def load_flashcards(doc_path):
     doc = Document(doc_path)
     flashcards = []
     for para in doc.paragraphs:
-        text = para.text.strip()
-        if not text:  # skip empty lines
-            continue
+        card = parse_flashcard_line(para.text)
+        if card:
+            flashcards.append(card)
+    
+    return flashcards
+
+# ⚡ Stream paragraphs straight out of the .docx ZIP
+W_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY, W_P, W_R, W_HYPERLINK = (W_NAMESPACE + tag for tag in ("body", "p", "r", "hyperlink"))
+# Text equivalents of run content, matching python-docx's Run.text
+W_RUN_TEXT = {
+    W_NAMESPACE + "tab": "\t",
+    W_NAMESPACE + "ptab": "\t",
+    W_NAMESPACE + "cr": "\n",
+    W_NAMESPACE + "noBreakHyphen": "-",
+}
+W_T, W_BR, W_TYPE = W_NAMESPACE + "t", W_NAMESPACE + "br", W_NAMESPACE + "type"
+
+def iter_docx_paragraphs(doc_path):
+    """Yield the text of each top-level paragraph, like Document(doc_path).paragraphs
+
+    Reads word/document.xml incrementally and discards each paragraph once its
+    text is known, so memory stays flat however large the document is. Only runs
+    directly inside the paragraph or inside a hyperlink count, as in python-docx.
+    """
+    with zipfile.ZipFile(doc_path) as archive, archive.open("word/document.xml") as xml:
+        path = []
+        body = None
+        pieces = []
+        for event, elem in ET.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                path.append(elem.tag)
+                if elem.tag == W_BODY and len(path) == 2:
+                    body = elem
+                continue
+            
+            depth = len(path)
+            path.pop()
+            if depth == 3 and elem.tag == W_P and path[1] == W_BODY:
+                yield "".join(pieces)
+                pieces = []
+                body.clear()  # drop paragraphs we have already read
+            elif depth >= 5 and path[-1] == W_R and path[2] == W_P and path[1] == W_BODY and (
+                depth == 5 or (depth == 6 and path[3] == W_HYPERLINK)
+            ):
+                if elem.tag == W_T:
+                    pieces.append(elem.text or "")
+                elif elem.tag == W_BR:
+                    # Only line breaks count as text; page and column breaks don't
+                    if elem.get(W_TYPE, "textWrapping") == "textWrapping":
+                        pieces.append("\n")
+                elif elem.tag in W_RUN_TEXT:
+                    pieces.append(W_RUN_TEXT[elem.tag])
+
+def iter_flashcards_fast(doc_path):
+    """Yield (english, arabic, translit) tuples without building python-docx objects"""
+    for text in iter_docx_paragraphs(doc_path):
+        card = parse_flashcard_line(text)
+        if card:
+            yield card
+
+@timed("load_flashcards_fast")
+def load_flashcards_fast(doc_path):
+    """Same result as load_flashcards, using the streaming parser where possible"""
+    try:
+        return list(iter_flashcards_fast(doc_path))
+    except KeyError:
+        # The main part isn't at word/document.xml; let python-docx follow the relationships.
+        # Undecorated, because this also runs in forked parse workers (see parse_documents)
+        return load_flashcards.__wrapped__(doc_path)
+
+# 📚 Deck made of one or more documents
+class Deck:
+    """Flashcards merged from several documents, de-duplicated, with per-deck tags"""
+
+    def __init__(self, parsed, errors=None, stale=None):
+        self.flashcards = []
+        self.tags = {}  # card -> names of the decks that contain it
+        self.by_deck = {}  # deck name -> indices into flashcards
+        self.errors = errors or []  # (path, message) for documents that failed to parse
+        self.stale = stale or []  # failed documents whose last good parse is used instead
+        positions = {}
+        for name, flashcards in parsed:
+            indices = self.by_deck.setdefault(name, [])
+            for card in flashcards:
+                i = positions.get(card)
+                if i is None:
+                    # Identical phrase triples from different documents become one card
+                    i = positions[card] = len(self.flashcards)
+                    self.flashcards.append(card)
+                    self.tags[card] = []
+                if name not in self.tags[card]:
+                    self.tags[card].append(name)
+                    indices.append(i)
+
+    @property
+    def names(self):
+        return list(self.by_deck)
+
+    def select(self, names):
+        """Cards belonging to any of the named decks, in deck order"""
+        if set(names) >= set(self.by_deck):
+            return self.flashcards
+        indices = sorted({i for name in names for i in self.by_deck.get(name, [])})
+        return [self.flashcards[i] for i in indices]
+
+def deck_name(path):
+    """Tag used for a document's cards: its file name without extension"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+def deck_hash(flashcards):
+    """Cheap identity for a list of cards, used to key per-deck caches"""
+    return hash(tuple(flashcards))
+
+def resolve_deck_paths(source):
+    """Expand a document path, directory or glob into a sorted list of .docx paths"""
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, "*.docx"))
+    elif any(char in source for char in "*?["):
+        paths = glob.glob(source, recursive=True)
+    else:
+        return [source]
+    
+    # Skip Word's lock files ("~$name.docx")
+    paths = sorted(path for path in paths if not os.path.basename(path).startswith("~$"))
+    if not paths:
+        raise FileNotFoundError(source)
+    return paths
+
+# ⚙️ Parse several documents in worker processes
+def _parse_documents_worker(paths, parse, results):
+    """Worker process: parse each document and send (path, flashcards, error, seconds) back"""
+    # Call the parser without its @timed wrapper: the metrics registry lives in
+    # the parent, so the child takes none of its locks and reports timings instead
+    parse = getattr(parse, "__wrapped__", parse)
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            results.put((path, parse(path), None, time.perf_counter() - start))
+        except Exception as e:
+            results.put((path, None, f"{type(e).__name__}: {e}", time.perf_counter() - start))
+
+def parse_documents(paths, parse=None, max_workers=None):
+    """Parse documents in parallel; returns ({path: flashcards}, [(path, error message)])"""
+    parse = parse or load_flashcards_fast
+    max_workers = min(max_workers or DECK_PARSE_WORKERS, len(paths))
+    parsed = {}
+    errors = []
+    
+    # Forked workers inherit the parser directly, so nothing defined in the Streamlit
+    # script has to be pickled. Without fork (Windows) documents are parsed in-process.
+    #
+    # Forking the multi-threaded server is safe here because a child only runs the
+    # undecorated parser (zipfile, iterparse and re on modules already imported) and
+    # its own result queue: it never touches st.cache_resource, the metrics registry,
+    # logging or any other lock another thread could have held at fork time.
+    if max_workers < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        for path in paths:
+            try:
+                parsed[path] = parse(path)
+            except Exception as e:
+                errors.append((path, f"{type(e).__name__}: {e}"))
+        return parsed, errors
+    
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [
+        context.Process(target=_parse_documents_worker, args=(paths[w::max_workers], parse, results), daemon=True)
+        for w in range(max_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        # Drain every result before joining so no worker blocks on a full queue
+        for _ in paths:
+            path, flashcards, error, seconds = results.get(timeout=DECK_PARSE_TIMEOUT_SECONDS)
+            record_duration(parse.__name__, seconds)
+            if error is None:
+                parsed[path] = flashcards
+            else:
+                errors.append((path, error))
+    except queue.Empty:
+        errors.extend((path, "Timed out while parsing") for path in paths if path not in parsed)
+    finally:
+        for worker in workers:
+            worker.join(timeout=1)
+            if worker.is_alive():
+                worker.terminate()
+    return parsed, errors
+
+# 🗂️ Parsed deck cache (in memory plus JSON sidecar files on disk)
+class ParsedDeckCache:
+    """Parsed flashcards keyed by document path, mtime, size and content hash"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._decks = {}  # abspath -> (fingerprint, flashcards)
+        self._digests = {}  # (abspath, mtime, size) -> sha256 of the file contents
+        self._merged = {}  # tuple of fingerprints -> Deck
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def fingerprint(self, doc_path):
+        """Return (abspath, mtime_ns, size, sha256) for the document"""
+        path = os.path.abspath(doc_path)
+        info = os.stat(path)
+        stat_key = (path, info.st_mtime_ns, info.st_size)
+        
+        # Only re-hash the file when its mtime or size has changed
+        with self._lock:
+            digest = self._digests.get(stat_key)
+        if digest is None:
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            with self._lock:
+                self._digests = {k: v for k, v in self._digests.items() if k[0] != path}
+                self._digests[stat_key] = digest
+        return stat_key + (digest,)
+
+    def _sidecar_path(self, path):
+        # One sidecar per document, overwritten whenever the document changes
+        name = hashlib.sha1(path.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _load_sidecar(self, path):
+        try:
+            with open(self._sidecar_path(path), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data if data.get("version") == DECK_CACHE_VERSION else None
+
+    def _read_sidecar(self, fingerprint):
+        data = self._load_sidecar(fingerprint[0])
+        if data is None or data.get("fingerprint") != list(fingerprint):
+            return None
+        return [tuple(card) for card in data["flashcards"]]
+
+    def _write_sidecar(self, fingerprint, flashcards):
+        path = self._sidecar_path(fingerprint[0])
+        data = {"version": DECK_CACHE_VERSION, "fingerprint": list(fingerprint), "flashcards": flashcards}
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass  # the in-memory copy is still usable
+
+    def _lookup(self, fingerprint):
+        """Parsed flashcards for this exact document version, from memory or the sidecar"""
+        with self._lock:
+            entry = self._decks.get(fingerprint[0])
+        if entry and entry[0] == fingerprint:
+            return entry[1]
+        flashcards = self._read_sidecar(fingerprint)
+        if flashcards is not None:
+            with self._lock:
+                self._decks[fingerprint[0]] = (fingerprint, flashcards)
+        return flashcards
+
+    def _last_good(self, path):
+        """Flashcards from the latest successful parse of a document, whichever version it was"""
+        with self._lock:
+            entry = self._decks.get(path)
+        if entry:
+            return entry[1]
+        data = self._load_sidecar(path)
+        return [tuple(card) for card in data["flashcards"]] if data else None
+
+    def _store(self, fingerprint, flashcards):
+        self._write_sidecar(fingerprint, flashcards)
+        with self._lock:
+            self._decks[fingerprint[0]] = (fingerprint, flashcards)
+
+    def invalidate(self, paths):
+        """Forget parsed and merged entries for documents that were removed"""
+        paths = {os.path.abspath(path) for path in paths}
+        with self._lock:
+            for path in paths:
+                self._decks.pop(path, None)
+            self._digests = {k: v for k, v in self._digests.items() if k[0] not in paths}
+            self._merged = {
+                key: deck for key, deck in self._merged.items()
+                if not any(fingerprint[0] in paths for fingerprint in key)
+            }
+        for path in paths:
+            if not os.path.exists(path):
+                with contextlib.suppress(OSError):
+                    os.remove(self._sidecar_path(path))
+
+    def load_deck(self, paths, parse=None):
+        """Return a merged Deck for several documents, re-parsing only the changed ones"""
+        fingerprints = [self.fingerprint(path) for path in paths]
+        key = tuple(fingerprints)
+        with self._lock:
+            deck = self._merged.get(key)
+        if deck is not None:
+            return deck
+        
+        parsed = {}
+        missing = []
+        for path, fingerprint in zip(paths, fingerprints):
+            flashcards = self._lookup(fingerprint)
+            if flashcards is None:
+                missing.append((path, fingerprint))
+            else:
+                parsed[path] = flashcards
         
-        # Split by " : " (space-colon-space) to handle the format correctly
-        parts = text.split(" : ")
+        # Changed documents are parsed in parallel
+        results, errors = parse_documents([path for path, _ in missing], parse)
+        stale = []
+        for path, fingerprint in missing:
+            if path in results:
+                self._store(fingerprint, results[path])
+                parsed[path] = results[path]
+                continue
+            # A document caught half-saved (or broken) keeps its last good cards
+            # rather than vanishing from the deck until it parses again
+            flashcards = self._last_good(fingerprint[0])
+            if flashcards is not None:
+                parsed[path] = flashcards
+                stale.append(path)
         
-        if len(parts) >= 3:
-            # Extract just the phrase (remove "Student:" or "Teacher:" prefix)
-            english_full = parts[0].strip()
-            english = re.sub(r'^(Student|Teacher):\s*', '', english_full)
-            
-            # Extract Arabic text from [text] format
-            arabic_raw = parts[1].strip()
-            arabic_match = re.search(r'\[(.*?)\]', arabic_raw)
-            arabic = arabic_match.group(1) if arabic_match else arabic_raw
-            
-            # Get transliteration
-            translit = parts[2].strip()
-            
-            flashcards.append((english, arabic, translit))
+        deck = Deck([(deck_name(path), parsed[path]) for path in paths if path in parsed], errors, stale)
+        with self._lock:
+            # Only the latest few merged decks are worth keeping
+            if len(self._merged) >= 4:
+                self._merged.clear()
+            self._merged[key] = deck
+        return deck
+
+@st.cache_resource
+def get_deck_cache():
+    """Process-wide parsed deck cache shared by every session"""
+    return ParsedDeckCache(DECK_CACHE_DIR)
+
+@timed("load_deck")
+def load_deck(source):
+    """Load every document matched by source (a file, directory or glob) into one merged Deck"""
+    return get_deck_cache().load_deck(resolve_deck_paths(source))
+
+# 🔄 Hot reload: watch the deck's documents and diff each new version against the last
+DeckDiff = collections.namedtuple("DeckDiff", "added removed changed")
+
+def diff_flashcards(old, new):
+    """Cards added, removed and changed (same English, new Arabic or transliteration) between two decks"""
+    old_by_english = {}
+    for card in old:
+        old_by_english.setdefault(card[0], card)
+    new_by_english = {}
+    for card in new:
+        new_by_english.setdefault(card[0], card)
     
-    return flashcards
+    old_cards, new_cards = set(old), set(new)
+    added = [card for card in new if card not in old_cards and card[0] not in old_by_english]
+    removed = [card for card in old if card not in new_cards and card[0] not in new_by_english]
+    changed = [
+        (old_by_english[card[0]], card) for card in new
+        if card not in old_cards and card[0] in old_by_english and old_by_english[card[0]] != card
+    ]
+    return DeckDiff(added, removed, changed)
+
+def stale_audio_keys(old_flashcards, new_flashcards, diff):
+    """Audio cache keys rendered for the old deck that nothing in the new deck uses any more"""
+    new_phrases = {("en", clean_tts_text(english, "en")) for english, _, _ in new_flashcards}
+    new_phrases |= {("ar", clean_tts_text(arabic, "ar")) for _, arabic, _ in new_flashcards}
+    new_pairs = {(english, arabic) for english, arabic, _ in new_flashcards}
+    
+    keys = set()
+    for english, arabic, _ in diff.removed + [old for old, _ in diff.changed]:
+        for text, lang in ((english, "en"), (arabic, "ar")):
+            if (lang, clean_tts_text(text, lang)) not in new_phrases:
+                keys.add(speech_audio_key(text, lang))
+        if (english, arabic) not in new_pairs:
+            keys.add(combined_audio_key(english, arabic))
+            keys.add(combined_audio_key(english, arabic, arabic_first=True))
+    
+    # Whole-deck playlists contain every card, so any change makes them stale
+    if any(diff):
+        keys.add(deck_playlist_key(old_flashcards))
+        keys.add(deck_playlist_key(old_flashcards, arabic_first=True))
+    return keys
+
+class DeckWatcher:
+    """Polls the deck's documents and, when they change, re-parses, diffs and invalidates caches
+
+    Every change bumps version; sessions compare it with the version they
+    rendered and rerun to pick up the new deck.
+    """
+
+    def __init__(self, source, interval):
+        self.source = source
+        self.interval = interval
+        self.version = 0
+        self.last_diff = None
+        self.last_change = None
+        self.last_error = None
+        self._snapshot = self._stat_documents()
+        self._flashcards = load_deck(source).flashcards
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="deck-watcher", daemon=True)
+        self._thread.start()
+
+    def _stat_documents(self):
+        """{path: (mtime_ns, size)}: cheap enough to take every interval"""
+        snapshot = {}
+        for path in resolve_deck_paths(self.source):
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            snapshot[os.path.abspath(path)] = (info.st_mtime_ns, info.st_size)
+        return snapshot
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+
+    def check(self):
+        """Reload the deck if any document was added, removed or modified; return the diff or None"""
+        snapshot = self._stat_documents()
+        if snapshot == self._snapshot:
+            return None
+        touched = {path for path in snapshot.keys() | self._snapshot.keys()
+                   if snapshot.get(path) != self._snapshot.get(path)}
+        
+        # The cache is keyed by content, so changed documents are re-parsed here
+        deck = load_deck(self.source)
+        failed = [(path, error) for path, error in deck.errors if os.path.abspath(path) in touched]
+        if failed:
+            # A half-saved or broken document must not look like deleted cards. Sessions
+            # get its last good parse from the deck cache meanwhile; retry on the next poll
+            self.last_error = "; ".join(f"{os.path.basename(path)}: {error}" for path, error in failed)
+            return None
+        
+        flashcards = deck.flashcards
+        diff = diff_flashcards(self._flashcards, flashcards)
+        audio_cache = get_audio_cache()
+        for key in stale_audio_keys(self._flashcards, flashcards, diff):
+            audio_cache.delete(key)
+        get_deck_cache().invalidate(touched - snapshot.keys())
+        
+        self._snapshot = snapshot
+        self._flashcards = flashcards
+        self.last_diff = diff
+        self.last_change = datetime.now()
+        self.last_error = None
+        self.version += 1
+        return diff
+
+    def stop(self):
+        self._stop.set()
+
+@st.cache_resource
+def get_deck_watcher(source):
+    """One watcher thread per deck source, shared by every session"""
+    return DeckWatcher(source, DECK_WATCH_INTERVAL_SECONDS)
+
+def deck_update_message(diff):
+    return (f"📚 Deck updated: {len(diff.added)} added, {len(diff.removed)} removed, "
+            f"{len(diff.changed)} changed")
+
+# 🚫 Emoji pattern, compiled once at import
+EMOJI_PATTERN = re.compile(
+    "["
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map symbols
+    "\U0001F1E0-\U0001F1FF"  # flags (iOS)
+    "\U00002500-\U00002BEF"  # Chinese characters and others
+    "\U00002702-\U000027B0"
+    "\U000024C2-\U0001F251"
+    "\U0001f926-\U0001f937"
+    "\U00010000-\U0010ffff"
+    "\u2640-\u2642"
+    "\u2600-\u2B55"
+    "\u200d"
+    "\u23cf"
+    "\u23e9"
+    "\u231a"
+    "\ufe0f"  # dingbats
+    "\u3030"
+    "]+",
+    flags=re.UNICODE
+)
+# Lowest code point EMOJI_PATTERN can match. Text made only of characters below it
+# (ASCII, Latin and the whole Arabic block including tashkeel) has nothing to remove.
+EMOJI_MIN_CODEPOINT = "\u200d"
 
 # 🚫 Remove emojis from text using regex
 def remove_emojis(text):
     """Remove all emojis from text using regex"""
-    # Unicode ranges for emojis
-    emoji_pattern = re.compile(
-        "["
-        "\U0001F600-\U0001F64F"  # emoticons
-        "\U0001F300-\U0001F5FF"  # symbols & pictographs
-        "\U0001F680-\U0001F6FF"  # transport & map symbols
-        "\U0001F1E0-\U0001F1FF"  # flags (iOS)
-        "\U00002500-\U00002BEF"  # Chinese characters and others
-        "\U00002702-\U000027B0"
-        "\U000024C2-\U0001F251"
-        "\U0001f926-\U0001f937"
-        "\U00010000-\U0010ffff"
-        "\u2640-\u2642"
-        "\u2600-\u2B55"
-        "\u200d"
-        "\u23cf"
-        "\u23e9"
-        "\u231a"
-        "\ufe0f"  # dingbats
-        "\u3030"
-        "]+", 
-        flags=re.UNICODE
-    )
-    return emoji_pattern.sub(r'', text)
+    # Fast path: pure ASCII or pure Arabic strings skip the regex entirely
+    if not text or max(text) < EMOJI_MIN_CODEPOINT:
+        return text
+    return EMOJI_PATTERN.sub(r'', text)
 
-# 🔊 Generate audio file from text (without emojis)
-def text_to_speech(text, lang="en"):
-    """Convert text to speech and return audio bytes"""
-    try:
-        # Remove emojis from text before converting to speech
-        clean_text = remove_emojis(text)
+# 🧹 Text normalization for speech
+@functools.lru_cache(maxsize=8192)
+def normalize_tts_text(text):
+    """Remove emojis and collapse whitespace (memoized per string)"""
+    return ' '.join(remove_emojis(text).split())
+
+# 🗄️ Content-addressed audio cache on disk
+class AudioCache:
+    """Disk-backed MP3 cache keyed by content hash, with size-bounded LRU eviction"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = None  # total bytes on disk, computed lazily
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        # Fan out into sub-directories so no single directory grows too large
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def get(self, key):
+        """Return cached audio bytes for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
         
-        # Clean up extra spaces that might be left after removing emojis
-        clean_text = ' '.join(clean_text.split())
+        # Touch the file so LRU eviction sees it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def contains(self, key):
+        """Check for an entry without counting a hit or miss"""
+        return os.path.exists(self._path(key))
+
+    def put(self, key, data):
+        """Store audio bytes under key and evict old entries if over budget"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        replaced = self._file_size(path)
+        
+        # Write to a temp file and rename, so other processes never read a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
         
-        # If the text becomes empty after removing emojis, use a fallback
-        if not clean_text.strip():
-            if lang == "en":
-                clean_text = "No text available"
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()[1]
             else:
-                clean_text = "لا يوجد نص"
-            
-        tts = gTTS(text=clean_text, lang=lang, slow=False)
+                # Overwriting an entry only adds the difference
+                self._size = max(self._size + len(data) - replaced, 0)
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def delete(self, key):
+        """Remove a single entry if present"""
+        path = self._path(key)
+        size = self._file_size(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            if self._size is not None:
+                self._size = max(self._size - size, 0)
+        return True
+
+    @staticmethod
+    def _file_size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _scan(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".mp3"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue  # removed by another process
+                entries.append((info.st_mtime, info.st_size, path))
+        return entries, sum(size for _, size, _ in entries)
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits its byte budget"""
+        with self._lock:
+            entries, total = self._scan()
+            # Evict down to 90% of the budget so we don't rescan on every write
+            target = int(self.max_bytes * 0.9)
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+            self._size = total
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+@st.cache_resource
+def get_audio_cache():
+    """Process-wide audio cache shared by every session"""
+    return AudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES)
+
+# 🧠 Audio kept in memory for playback
+class AudioMemoryAccountant:
+    """Tracks the audio bytes every session holds, so the server stays under one overall budget"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        # Sessions drop out of the set when their session_state is garbage collected
+        self._holders = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def register(self, holder):
+        with self._lock:
+            self._holders.add(holder)
+
+    def allowance(self, holder):
+        """Bytes holder may keep given what every other session currently holds"""
+        with self._lock:
+            others = sum(other.size for other in self._holders if other is not holder)
+        return max(self.max_bytes - others, 0)
+
+    def stats(self):
+        with self._lock:
+            holders = list(self._holders)
+        return {
+            "sessions": len(holders),
+            "bytes": sum(holder.size for holder in holders),
+            "max_bytes": self.max_bytes,
+        }
+
+@st.cache_resource
+def get_audio_memory_accountant():
+    """Process-wide accounting of in-memory audio across sessions"""
+    return AudioMemoryAccountant(SERVER_AUDIO_MAX_BYTES)
+
+class SessionAudio:
+    """Per-session playback audio with a byte budget and LRU eviction
+
+    Only the bytes are evicted: each entry remembers how to fetch its audio again,
+    normally a hit in the shared disk cache, so an evicted clip still plays.
+    """
+
+    def __init__(self, max_bytes, accountant=None):
+        self.max_bytes = max_bytes
+        self.accountant = accountant
+        self.size = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()  # audio_id -> [audio bytes or None, reload]
+        self._lock = threading.Lock()
+        if accountant is not None:
+            accountant.register(self)
+
+    def put(self, audio_id, audio_bytes, reload):
+        """Hold audio_bytes for audio_id; reload() must return the same audio after eviction"""
+        with self._lock:
+            self._drop(audio_id)
+            self._entries[audio_id] = [audio_bytes, reload]
+            self.size += len(audio_bytes)
+            self._evict()
+
+    def get(self, audio_id):
+        """Return the audio for audio_id, reloading it if it was evicted; None if unknown"""
+        with self._lock:
+            entry = self._entries.get(audio_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(audio_id)
+            if entry[0] is not None:
+                return entry[0]
+            reload = entry[1]
+        
+        # Reload outside the lock: it may hit the disk or synthesize
+        audio_bytes = reload()
+        if audio_bytes:
+            self.put(audio_id, audio_bytes, reload)
+        return audio_bytes
+
+    def _drop(self, audio_id):
+        entry = self._entries.pop(audio_id, None)
+        if entry and entry[0] is not None:
+            self.size -= len(entry[0])
+
+    def _evict(self):
+        budget = self.max_bytes
+        if self.accountant is not None:
+            budget = min(budget, self.accountant.allowance(self))
+        # The newest entry is what is about to play, so it is always kept
+        for audio_id, entry in list(self._entries.items())[:-1]:
+            if self.size <= budget:
+                break
+            if entry[0] is not None:
+                self.size -= len(entry[0])
+                entry[0] = None
+                self.evictions += 1
+
+def get_session_audio():
+    """This session's playback audio holder"""
+    if 'session_audio' not in st.session_state:
+        st.session_state.session_audio = SessionAudio(SESSION_AUDIO_MAX_BYTES, get_audio_memory_accountant())
+    return st.session_state.session_audio
+
+def hold_audio(audio_id, audio_bytes, text, lang):
+    """Keep audio for playback in this session; evicted audio is reloaded from the shared cache"""
+    get_session_audio().put(audio_id, audio_bytes, functools.partial(text_to_speech, text, lang))
+
+def audio_cache_key(clean_text, lang, voice):
+    """Content address for audio: hash of the cleaned text, language and voice parameters"""
+    payload = json.dumps([clean_text, lang, voice], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# 🔇 One silent MPEG-2 Layer III frame (24 kHz, 32 kbps, mono), the same format gTTS produces
+SILENT_MP3_FRAME = b"\xff\xf3\x44\xc4" + bytes(92)
+
+def syncsafe(n):
+    """ID3v2 size field: 28 bits spread over four 7-bit bytes"""
+    return bytes([(n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F])
+
+def unsyncsafe(data):
+    size = 0
+    for byte in data:
+        size = (size << 7) | (byte & 0x7F)
+    return size
+
+def id3v2_frame(frame_id, payload):
+    return frame_id.encode("ascii") + syncsafe(len(payload)) + b"\x00\x00" + payload
+
+def id3v2_tag(frames):
+    """Build an ID3v2.4 tag from (frame_id, payload) pairs"""
+    body = b"".join(id3v2_frame(frame_id, payload) for frame_id, payload in frames)
+    return b"ID3\x04\x00\x00" + syncsafe(len(body)) + body
+
+def id3_text(text):
+    """Payload of a UTF-8 text frame such as TIT2"""
+    return b"\x03" + text.encode("utf-8")
+
+# 📑 ID3 chapters (CHAP) and their table of contents (CTOC)
+ID3_CTOC_MAX_ENTRIES = 255  # the entry count is a single byte
+
+def id3_chapter_frames(chapters, title=""):
+    """CHAP frames for (start_ms, end_ms, title) chapters, plus CTOC frames listing them in order"""
+    frames = []
+    chapter_ids = []
+    for i, (start_ms, end_ms, chapter_title) in enumerate(chapters):
+        element_id = f"ch{i}".encode("ascii")
+        chapter_ids.append(element_id)
+        # Byte offsets are left unset (0xFFFFFFFF); players seek by time
+        payload = (element_id + b"\x00" + struct.pack(">IIII", int(start_ms), int(end_ms), 0xFFFFFFFF, 0xFFFFFFFF)
+                   + id3v2_frame("TIT2", id3_text(chapter_title)))
+        frames.append(("CHAP", payload))
+    
+    def toc(element_id, children, top_level):
+        flags = 0x03 if top_level else 0x01  # top-level, ordered
+        payload = element_id + b"\x00" + bytes([flags, len(children)]) + b"".join(child + b"\x00" for child in children)
+        if top_level and title:
+            payload += id3v2_frame("TIT2", id3_text(title))
+        return ("CTOC", payload)
+    
+    # More chapters than one CTOC can list: a top-level CTOC of sub-tables
+    if len(chapter_ids) <= ID3_CTOC_MAX_ENTRIES:
+        frames.append(toc(b"toc", chapter_ids, True))
+    else:
+        sub_ids = []
+        for start in range(0, len(chapter_ids), ID3_CTOC_MAX_ENTRIES):
+            sub_id = f"toc{len(sub_ids) + 1}".encode("ascii")
+            sub_ids.append(sub_id)
+            frames.append(toc(sub_id, chapter_ids[start:start + ID3_CTOC_MAX_ENTRIES], False))
+        frames.append(toc(b"toc", sub_ids, True))
+    return frames
+
+def read_id3_chapters(data):
+    """(start_ms, end_ms, title) for each CHAP frame of a leading ID3v2.4 tag, in file order"""
+    if data[:3] != b"ID3":
+        return []
+    end = 10 + unsyncsafe(data[6:10])
+    offset = 10
+    chapters = []
+    while offset + 10 <= end:
+        frame_id = data[offset:offset + 4]
+        size = unsyncsafe(data[offset + 4:offset + 8])
+        payload = data[offset + 10:offset + 10 + size]
+        offset += 10 + size
+        if frame_id == b"\x00\x00\x00\x00":
+            break  # padding
+        if frame_id != b"CHAP":
+            continue
+        id_end = payload.index(b"\x00")
+        start_ms, end_ms = struct.unpack(">II", payload[id_end + 1:id_end + 9])
+        title = ""
+        sub = payload[id_end + 17:]
+        if sub[:4] == b"TIT2":
+            title = sub[11:10 + unsyncsafe(sub[4:8])].decode("utf-8")
+        chapters.append((start_ms, end_ms, title))
+    return chapters
+
+# 🎚️ MPEG audio frame headers
+MP3_BITRATES_KBPS = {
+    # (is MPEG-1, layer) -> bitrate by index
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# Version bits -> sample rate by index (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+Mp3Frame = collections.namedtuple(
+    "Mp3Frame", "header mpeg1 layer bitrate sample_rate padding protected mono length samples side_info"
+)
+
+def parse_mp3_frame_header(data, offset):
+    """Decode the frame header at offset, or return None if there is no valid frame there"""
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset:offset + 4]
+    if b0 != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+    version_bits = (b1 >> 3) & 3
+    layer_bits = (b1 >> 1) & 3
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 3
+    # Reserved values, and free-format streams we can't measure
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    
+    mpeg1 = version_bits == 3
+    layer = 4 - layer_bits
+    bitrate = MP3_BITRATES_KBPS[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version_bits][rate_index]
+    padding = (b2 >> 1) & 1
+    mono = b3 >> 6 == 3
+    if layer == 1:
+        length, samples = (12 * bitrate // sample_rate + padding) * 4, 384
+    elif layer == 2:
+        length, samples = 144 * bitrate // sample_rate + padding, 1152
+    elif mpeg1:
+        length, samples = 144 * bitrate // sample_rate + padding, 1152
+    else:
+        length, samples = 72 * bitrate // sample_rate + padding, 576
+    
+    # Layer III side information sits between the header and the Xing/Info tag
+    if layer == 3:
+        side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    else:
+        side_info = 0
+    return Mp3Frame(bytes([b0, b1, b2, b3]), mpeg1, layer, bitrate, sample_rate, padding,
+                    not b1 & 1, mono, length, samples, side_info)
+
+def iter_mp3_frames(data):
+    """Yield (offset, Mp3Frame) for each audio frame, skipping ID3 tags and junk between frames"""
+    end = len(data)
+    if end >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128  # ID3v1 tag
+    offset = 0
+    while offset + 4 <= end:
+        if data[offset:offset + 3] == b"ID3" and offset + 10 <= end:
+            size = unsyncsafe(data[offset + 6:offset + 10])
+            footer = 10 if data[offset + 5] & 0x10 else 0
+            offset += 10 + size + footer
+            continue
+        
+        frame = parse_mp3_frame_header(data, offset)
+        if frame:
+            if offset + frame.length > end:
+                break  # truncated last frame
+            yield offset, frame
+            offset += frame.length
+            continue
+        
+        # Not a frame header: resynchronise on the next 0xFF byte
+        offset = data.find(b"\xff", offset + 1, end)
+        if offset < 0:
+            break
+
+def is_vbr_header_frame(data, offset, frame):
+    """Whether the frame is a Xing/Info or VBRI header rather than audio"""
+    tag_offset = offset + 4 + (2 if frame.protected else 0) + frame.side_info
+    return (data[tag_offset:tag_offset + 4] in (b"Xing", b"Info")
+            or data[offset + 36:offset + 40] == b"VBRI")
+
+# 🎚️ Join MP3 streams without decoding them
+class Mp3Joiner:
+    """Concatenate MP3 streams frame by frame, with silent gaps and one fresh Info/Xing header
+
+    ID3 tags and the per-stream Xing/Info headers are dropped, so players see a
+    single stream with the right duration. Streams should share a sample rate and
+    channel mode, as every stream from one TTS backend does; nothing is re-encoded.
+    """
+
+    def __init__(self):
+        self._frames = io.BytesIO()
+        self.frame_count = 0
+        self.sample_count = 0
+        self.sample_rate = None
+        self._template = None  # first audio frame, used for silence and the Info header
+        self._bitrates = set()
+
+    def append(self, mp3_bytes):
+        """Append the audio frames of one MP3 stream"""
+        view = memoryview(mp3_bytes)
+        found = False
+        for offset, frame in iter_mp3_frames(mp3_bytes):
+            if not found and is_vbr_header_frame(mp3_bytes, offset, frame):
+                continue
+            found = True
+            if self._template is None:
+                self._template = frame
+                self.sample_rate = frame.sample_rate
+            self._frames.write(view[offset:offset + frame.length])
+            self._bitrates.add(frame.bitrate)
+            self.frame_count += 1
+            self.sample_count += frame.samples
+        if not found:
+            raise ValueError("No MPEG audio frames found")
+
+    def _blank_frame(self):
+        """A frame with the stream's format, no CRC, no padding and an all-zero body"""
+        template = self._template or parse_mp3_frame_header(SILENT_MP3_FRAME, 0)
+        b0, b1, b2, b3 = template.header
+        header = bytes([b0, b1 | 1, b2 & 0xFC, b3 & 0xCF])
+        return bytearray(header + bytes(template.length - template.padding - 4)), template
+
+    def append_silence(self, milliseconds):
+        """Append roughly milliseconds of silent frames"""
+        frame, template = self._blank_frame()
+        count = round(milliseconds / 1000 * template.sample_rate / template.samples)
+        self._frames.write(bytes(frame) * count)
+        self._bitrates.add(template.bitrate)
+        self.frame_count += count
+        self.sample_count += count * template.samples
+        if self.sample_rate is None:
+            self.sample_rate = template.sample_rate
+
+    @property
+    def duration_ms(self):
+        return 1000 * self.sample_count / self.sample_rate if self.sample_rate else 0
+
+    def getvalue(self):
+        """The joined stream, starting with an Info (CBR) or Xing (VBR) header frame"""
+        header_frame, template = self._blank_frame()
+        tag_offset = 4 + template.side_info
+        body = self._frames.getvalue()
+        header_frame[tag_offset:tag_offset + 4] = b"Info" if len(self._bitrates) <= 1 else b"Xing"
+        # Flags: frame count and byte count present
+        struct.pack_into(">III", header_frame, tag_offset + 4, 0x3, self.frame_count, len(header_frame) + len(body))
+        return bytes(header_frame) + body
+
+def join_mp3(segments, gap_ms=COMBINED_AUDIO_GAP_MS):
+    """Join MP3 byte strings into one stream with gap_ms of silence between them"""
+    joiner = Mp3Joiner()
+    for i, segment in enumerate(segments):
+        if i and gap_ms:
+            joiner.append_silence(gap_ms)
+        joiner.append(segment)
+    return joiner.getvalue()
+
+# 🗣️ Text-to-speech backends, all implementing synthesize(text, lang) -> MP3 bytes
+class GTTSBackend:
+    """Google Text-to-Speech (requires an internet connection)"""
+
+    name = "gtts"
+    label = "Google Text-to-Speech (gTTS)"
+    # Remote services are rate limited; local backends only go through the circuit breaker
+    remote = True
+
+    def __init__(self, slow=False, tld="com"):
+        self.slow = slow
+        self.tld = tld
+
+    @staticmethod
+    def available():
+        return True
+
+    def voice(self):
+        """Voice parameters that affect the audio (part of the audio cache key)"""
+        return {"engine": self.name, "slow": self.slow, "tld": self.tld}
+
+    def synthesize(self, text, lang):
+        tts = gTTS(text=text, lang=lang, slow=self.slow, tld=self.tld)
         audio_bytes = io.BytesIO()
         tts.write_to_fp(audio_bytes)
-        audio_bytes.seek(0)
         return audio_bytes.getvalue()
-    except Exception as e:
-        st.error(f"Error generating audio: {e}")
-        return None
 
-# 🔊 Generate combined audio file (English followed by Arabic)
-def generate_combined_audio(english_text, arabic_text):
-    """Generate audio with English first, then Arabic"""
-    try:
-        # Generate English audio
-        english_audio = text_to_speech(english_text, lang="en")
+class EspeakBackend:
+    """Offline espeak-ng voice, encoded to MP3 with ffmpeg or lame"""
+
+    name = "espeak"
+    label = "espeak-ng (offline)"
+    remote = False
+    VOICES = {"en": "en-us", "ar": "ar"}
+
+    def __init__(self, speed=150):
+        self.speed = speed
+
+    @staticmethod
+    def available():
+        return bool(shutil.which("espeak-ng") and (shutil.which("ffmpeg") or shutil.which("lame")))
+
+    def voice(self):
+        return {"engine": self.name, "speed": self.speed}
+
+    def synthesize(self, text, lang):
+        wav = subprocess.run(
+            ["espeak-ng", "-v", self.VOICES.get(lang, lang), "-s", str(self.speed), "--stdin", "--stdout"],
+            input=text.encode("utf-8"), capture_output=True, check=True, timeout=60,
+        ).stdout
+        
+        # espeak-ng only writes WAV, so encode it to MP3 like the other backends
+        if shutil.which("ffmpeg"):
+            command = ["ffmpeg", "-loglevel", "error", "-f", "wav", "-i", "pipe:0",
+                       "-ac", "1", "-b:a", "48k", "-f", "mp3", "pipe:1"]
+        else:
+            command = ["lame", "--quiet", "-m", "m", "-b", "48", "-", "-"]
+        return subprocess.run(command, input=wav, capture_output=True, check=True, timeout=60).stdout
+
+class FakeBackend:
+    """Deterministic in-process backend returning silent MP3 frames, for tests and load tests"""
+
+    name = "fake"
+    label = "Fake TTS (silent audio, no network)"
+    remote = False
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    @staticmethod
+    def available():
+        return True
+
+    def voice(self):
+        return {"engine": self.name}
+
+    def synthesize(self, text, lang):
+        if self.latency:
+            time.sleep(self.latency)
+        # Tag the audio with its text so different phrases give different bytes,
+        # and make longer phrases proportionally longer (24 ms per frame)
+        title = id3_text(f"{lang}: {text}")
+        return id3v2_tag([("TIT2", title)]) + SILENT_MP3_FRAME * (10 + len(text))
+
+TTS_BACKENDS = {
+    "gtts": GTTSBackend,
+    "espeak": EspeakBackend,
+    "fake": FakeBackend,
+}
+
+@st.cache_resource
+def get_tts_backend(name=None):
+    """Return the configured text-to-speech backend"""
+    name = name or TTS_BACKEND
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS backend {name!r}, expected one of {sorted(TTS_BACKENDS)}")
+    if name == "fake":
+        return FakeBackend(latency=FAKE_TTS_LATENCY_SECONDS)
+    if not TTS_BACKENDS[name].available():
+        raise RuntimeError(f"TTS backend {name!r} is not available on this machine")
+    return TTS_BACKENDS[name]()
+
+def available_tts_backends():
+    """Names of the backends that can run on this machine"""
+    return [name for name, backend in TTS_BACKENDS.items() if backend.available()]
+
+# 🚦 Rate limiting and circuit breaking for the TTS backend
+class TTSUnavailable(RuntimeError):
+    """The TTS backend was not called because it is throttled or failing"""
+
+class RateLimited(TTSUnavailable):
+    pass
+
+class CircuitOpen(TTSUnavailable):
+    pass
+
+class TokenBucket:
+    """Thread-safe token bucket: rate tokens per second, holding at most capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.rejected = 0
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=0):
+        """Take a token, waiting up to timeout seconds for one; return False if none came"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else timeout
+                if now + wait > deadline:
+                    self.rejected += 1
+                    return False
+            time.sleep(wait)
+
+class CircuitBreaker:
+    """Closed -> open after failure_threshold consecutive failures; half-open after reset_seconds
+
+    While open every call is rejected at once. In half-open a single trial call
+    is let through: success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.rejected = 0
+        self.transitions = []  # (timestamp, new state), most recent last
+        self._opened_at = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.state = state
+            self.transitions.append((datetime.now(), state))
+            del self.transitions[:-20]
+
+    def allow(self):
+        """Whether a call may go through now"""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._set_state("half-open")
+            if self.state == "closed":
+                return True
+            if self.state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def release_trial(self):
+        """Give back the half-open trial slot when the call never reached the backend"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            self._set_state("closed")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state("open")
+
+class TTSGuard:
+    """Rate limiter plus circuit breaker around backend calls"""
+
+    def __init__(self, limiter, breaker):
+        self.limiter = limiter
+        self.breaker = breaker
+
+    def call(self, fn, *args, throttle=True):
+        """Return fn(*args), or raise TTSUnavailable without calling fn"""
+        if not self.breaker.allow():
+            raise CircuitOpen("Voice service is temporarily unavailable after repeated errors")
+        if throttle and not self.limiter.acquire(timeout=TTS_RATE_WAIT_SECONDS):
+            # Not the backend's fault, so it doesn't count as a failure
+            self.breaker.release_trial()
+            raise RateLimited("Too many voice requests right now, please try again shortly")
+        try:
+            result = fn(*args)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def stats(self):
+        return {
+            "state": self.breaker.state,
+            "failures": self.breaker.failures,
+            "breaker_rejected": self.breaker.rejected,
+            "rate_limited": self.limiter.rejected,
+            "transitions": list(self.breaker.transitions),
+        }
+
+@st.cache_resource
+def get_tts_guard():
+    """Process-wide rate limiter and circuit breaker shared by every session"""
+    return TTSGuard(
+        TokenBucket(TTS_RATE_PER_SECOND, TTS_BURST),
+        CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS),
+    )
+
+def placeholder_audio(seconds=1):
+    """Silent MP3 played instead of speech while the TTS backend is unavailable"""
+    frame = parse_mp3_frame_header(SILENT_MP3_FRAME, 0)
+    return SILENT_MP3_FRAME * round(seconds * frame.sample_rate / frame.samples)
+
+# 🤝 Single-flight: concurrent requests for the same audio share one synthesis
+class SingleFlight:
+    """Run fn once per key at a time; callers arriving while it runs wait and share its result"""
+
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self._flights = {}  # key -> [done event, result, exception]
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return fn(), or the result of the identical call already in flight (exceptions are shared too)"""
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = [threading.Event(), None, None]
+                self.executions += 1
+            else:
+                self.coalesced += 1
         
-        # Generate Arabic audio
-        arabic_audio = text_to_speech(arabic_text, lang="ar")
+        if not leader:
+            flight[0].wait()
+            if flight[2] is not None:
+                raise flight[2]
+            return flight[1]
         
-        if english_audio and arabic_audio:
-            # Combine the audio bytes (simple concatenation)
-            combined_bytes = english_audio + arabic_audio
-            return combined_bytes
+        try:
+            flight[1] = fn()
+        except BaseException as e:
+            flight[2] = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight[0].set()
+        return flight[1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights),
+            }
+
+@st.cache_resource
+def get_synthesis_flights():
+    """Process-wide single-flight group for audio synthesis, shared by every session and thread"""
+    return SingleFlight()
+
+# 🧹 Prepare text for speech
+def clean_tts_text(text, lang="en"):
+    """Strip emojis and extra whitespace, falling back to a placeholder if nothing is left"""
+    # Remove emojis and the extra spaces they leave behind
+    clean_text = normalize_tts_text(text)
+    
+    # If the text becomes empty after removing emojis, use a fallback
+    if not clean_text.strip():
+        if lang == "en":
+            clean_text = "No text available"
         else:
-            return None
+            clean_text = "لا يوجد نص"
+    return clean_text
+
+# 🔑 Audio cache key for a single phrase
+def speech_audio_key(text, lang="en"):
+    """Cache key for the audio synthesize_speech produces for text"""
+    return audio_cache_key(clean_tts_text(text, lang), lang, get_tts_backend().voice())
+
+# 🔊 Synthesize speech, reusing cached audio where possible
+def synthesize_speech(text, lang="en"):
+    """Return MP3 bytes for text, calling the TTS backend only on an audio cache miss (raises on failure)"""
+    clean_text = clean_tts_text(text, lang)
+    backend = get_tts_backend()
+    cache = get_audio_cache()
+    key = audio_cache_key(clean_text, lang, backend.voice())
+    
+    audio = cache.get(key)
+    if audio is not None:
+        return audio
+    
+    def synthesize():
+        # A flight that finished just before ours started has already cached the audio
+        if cache.contains(key):
+            audio = cache.get(key)
+            if audio is not None:
+                return audio
+        audio = get_tts_guard().call(backend.synthesize, clean_text, lang, throttle=backend.remote)
+        
+        # A full or read-only disk should not stop audio from playing
+        try:
+            cache.put(key, audio)
+        except OSError:
+            pass
+        return audio
+    
+    return get_synthesis_flights().do(key, synthesize)
+
+# 🔊 Generate audio file from text (without emojis)
+@timed("text_to_speech")
+def text_to_speech(text, lang="en"):
+    """Convert text to speech and return audio bytes"""
+    try:
+        return synthesize_speech(text, lang)
+    except TTSUnavailable as e:
+        # Fail fast with silence rather than adding load to a struggling service
+        st.warning(f"🔇 {e}")
+        return placeholder_audio()
     except Exception as e:
-        st.error(f"Error generating combined audio: {e}")
+        st.error(f"Error generating audio: {e}")
         return None
 
+# 🔑 Audio cache key for a combined English/Arabic recording
+def combined_audio_key(english_text, arabic_text, arabic_first=False):
+    """Cache key for combined audio, derived from both cleaned phrases and their order"""
+    order = "ar+en" if arabic_first else "en+ar"
+    phrases = [clean_tts_text(english_text, "en"), clean_tts_text(arabic_text, "ar")]
+    voice = dict(get_tts_backend().voice(), gap_ms=COMBINED_AUDIO_GAP_MS)
+    return audio_cache_key(phrases, order, voice)
+
+# 🔊 Build combined audio bytes (English followed by Arabic)
+# Every combined recording (download buttons, bulk export, pre-rendering) goes
+# through here, so this is where combined audio is timed
+@timed("render_combined_audio")
+def render_combined_audio(english_text, arabic_text, arabic_first=False):
+    """Return English audio followed by Arabic audio, or the reverse (raises on failure)"""
+    cache = get_audio_cache()
+    key = combined_audio_key(english_text, arabic_text, arabic_first)
+    combined = cache.get(key)
+    if combined is not None:
+        return combined
+    
+    def render():
+        if cache.contains(key):
+            combined = cache.get(key)
+            if combined is not None:
+                return combined
+        english_audio = synthesize_speech(english_text, lang="en")
+        arabic_audio = synthesize_speech(arabic_text, lang="ar")
+        
+        # Join the two recordings frame by frame with a short pause in between
+        segments = [arabic_audio, english_audio] if arabic_first else [english_audio, arabic_audio]
+        try:
+            combined = join_mp3(segments)
+        except ValueError:
+            # Not MPEG audio we can parse; fall back to plain concatenation
+            combined = b"".join(segments)
+        
+        try:
+            cache.put(key, combined)
+        except OSError:
+            pass
+        return combined
+    
+    return get_synthesis_flights().do(key, render)
+
+# 🎧 Whole-deck playlist: every card in one continuous, seekable recording
+def deck_playlist_key(flashcards, arabic_first=False):
+    """Cache key for a playlist, derived from every card's cleaned phrases, the order and the gaps"""
+    order = "ar+en" if arabic_first else "en+ar"
+    phrases = [[clean_tts_text(english, "en"), clean_tts_text(arabic, "ar")] for english, arabic, _ in flashcards]
+    voice = dict(get_tts_backend().voice(), gap_ms=COMBINED_AUDIO_GAP_MS, card_gap_ms=PLAYLIST_CARD_GAP_MS)
+    return audio_cache_key(phrases, f"playlist:{order}", voice)
+
+@st.cache_resource(max_entries=8)
+def get_deck_playlist_key(deck_hash, arabic_first, _flashcards):
+    """Playlist key per deck; cleaning and hashing every phrase is too slow for each rerun"""
+    return deck_playlist_key(_flashcards, arabic_first)
+
+def build_deck_playlist(flashcards, arabic_first=False, max_workers=BULK_MAX_WORKERS, on_progress=None):
+    """Return MP3 bytes of every card (phrase, gap, translation, gap) with one ID3 chapter per card
+
+    Phrases are synthesized (or read from the audio cache) in parallel and
+    appended to the stream in card order as they arrive.
+    """
+    jobs = []
+    for english, arabic, _ in flashcards:
+        parts = [(arabic, "ar"), (english, "en")] if arabic_first else [(english, "en"), (arabic, "ar")]
+        jobs.extend(functools.partial(synthesize_speech, text, lang) for text, lang in parts)
+    
+    joiner = Mp3Joiner()
+    chapters = []
+    # Closing the results on the first error cancels the jobs that have not started
+    with contextlib.closing(synthesize_many(jobs, max_workers=max_workers, on_progress=on_progress)) as results:
+        for i, audio, error in results:
+            if error is not None:
+                raise error
+            if i % 2 == 0:
+                start_ms = joiner.duration_ms
+            else:
+                joiner.append_silence(COMBINED_AUDIO_GAP_MS)
+            joiner.append(audio)
+            if i % 2 == 1:
+                english, arabic, _ = flashcards[i // 2]
+                chapters.append((start_ms, joiner.duration_ms, f"{i // 2 + 1}. {english}"))
+                joiner.append_silence(PLAYLIST_CARD_GAP_MS)
+    
+    tag = id3v2_tag([("TIT2", id3_text("Flashcards"))] + id3_chapter_frames(chapters, title="Flashcards"))
+    return tag + joiner.getvalue()
+
+def render_deck_playlist(flashcards, arabic_first=False, on_progress=None):
+    """Return (mp3 bytes, chapters) for the playlist, building it only on an audio cache miss"""
+    cache = get_audio_cache()
+    key = deck_playlist_key(flashcards, arabic_first)
+    
+    def render():
+        audio = cache.get(key) if cache.contains(key) else None
+        if audio is None:
+            audio = build_deck_playlist(flashcards, arabic_first, on_progress=on_progress)
+            try:
+                cache.put(key, audio)
+            except OSError:
+                pass
+        return audio
+    
+    audio = get_synthesis_flights().do(key, render)
+    return audio, read_id3_chapters(audio)
+
+# 🔁 Retry a synthesis job with exponential backoff
+def run_with_retries(job, retries=SYNTH_RETRIES, backoff=SYNTH_BACKOFF_SECONDS):
+    """Call job(), retrying failures with exponential backoff and jitter"""
+    for attempt in range(retries + 1):
+        try:
+            return job()
+        except CircuitOpen:
+            # Retrying can't help until the breaker lets calls through again
+            raise
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) + random.uniform(0, backoff))
+
+# ⚙️ Run many synthesis jobs on a bounded worker pool
+def synthesize_many(jobs, max_workers=BULK_MAX_WORKERS, retries=SYNTH_RETRIES,
+                    backoff=SYNTH_BACKOFF_SECONDS, on_progress=None):
+    """Run zero-argument synthesis jobs concurrently, yielding (index, audio, error) in job order
+    
+    Results are yielded as soon as every earlier job has finished, so callers can
+    stream them into an archive while later jobs are still running. on_progress is
+    called as on_progress(done, total) from the calling thread after each job.
+    Closing the generator early (or an exception in on_progress) cancels the jobs
+    that have not started yet.
+    """
+    total = len(jobs)
+    finished = {}
+    next_index = 0
+    done = 0
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        futures = {
+            pool.submit(run_with_retries, job, retries, backoff): i
+            for i, job in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                finished[i] = (future.result(), None)
+            except Exception as e:
+                finished[i] = (None, e)
+            done += 1
+            if on_progress:
+                on_progress(done, total)
+            
+            # Release results in card order
+            while next_index in finished:
+                audio, error = finished.pop(next_index)
+                yield next_index, audio, error
+                next_index += 1
+    finally:
+        # After a full run nothing is pending; otherwise only running jobs are waited for
+        pool.shutdown(wait=True, cancel_futures=True)
+
+# ⬇️ Download button that synthesizes only when clicked
+def combined_audio_download_button(english_text, arabic_text, filename, key, label="⬇️ Download Audio",
+                                   arabic_first=False):
+    """Render a download button whose audio is generated lazily on click"""
+    # The callable is run by Streamlit's media endpoint when the user clicks,
+    # so rendering the button costs no synthesis and clicking it causes no rerun
+    st.download_button(
+        label,
+        data=functools.partial(render_combined_audio, english_text, arabic_text, arabic_first),
+        file_name=filename,
+        mime="audio/mpeg",
+        key=key,
+        on_click="ignore",
+    )
+
+# 🔁 Looping audio player
+def play_looping_audio(audio_bytes, message):
+    """Play audio on loop through st.audio, which serves the bytes by URL instead of an inline data URI"""
+    # Streamlit's media file manager stores the bytes once (keyed by content hash)
+    # and only sends a URL over the websocket on each rerun
+    st.audio(audio_bytes, format="audio/mpeg", loop=True, autoplay=True)
+    st.success(message)
+
 # ⏹️ Stop audio function
 def stop_audio():
     """Stop currently playing audio"""
@@ -143,7 +1865,214 @@ def stop_audio():
     st.session_state.audio_playing = None
     st.rerun()
 
+# 📄 Pagination callbacks (run before the rerun, so they may change widget state)
+def reset_card_page():
+    """Go back to the first page after the search or page size changes"""
+    st.session_state.card_page = 1
+
+def change_card_page(step):
+    """Move to the previous or next page"""
+    st.session_state.card_page = max(1, st.session_state.card_page + step)
+
+def jump_to_card():
+    """Show the page containing the requested card number"""
+    card_number = st.session_state.get("card_jump")
+    if card_number:
+        st.session_state.card_search = ""
+        st.session_state.card_page = (int(card_number) - 1) // st.session_state.card_page_size + 1
+
+# 🔎 Search index over English, Arabic and transliteration
+# Arabic spelling variants that should match each other: diacritics (tashkeel,
+# U+064B-U+065F and the superscript alef U+0670) and tatweel are dropped, alef
+# forms become a bare alef, alef maqsura becomes ya and ta marbuta becomes ha
+ARABIC_SEARCH_FOLDING = {
+    **{codepoint: None for codepoint in range(0x064B, 0x0660)},
+    0x0670: None,
+    0x0640: None,
+    **{ord(alef): "ا" for alef in "أإآٱ"},
+    ord("ى"): "ي",
+    ord("ة"): "ه",
+    # Transliterations mark ayn and hamza with apostrophes ("na‘am"); "naam" should match
+    **{ord(mark): None for mark in "'‘’ʿʾ`"},
+}
+SEARCH_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+SEARCH_MIN_PREFIX = 2
+SEARCH_FUZZY_MIN_SIMILARITY = 0.3
+
+def fold_search_text(text):
+    """Normalize text for searching: Arabic folding, Latin accents removed ("ā" -> "a"), case folded"""
+    text = text.translate(ARABIC_SEARCH_FOLDING)
+    # Transliterations use accented Latin letters; drop the accents
+    if not text.isascii():
+        text = "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+    return text.casefold()
+
+def search_tokens(text):
+    return SEARCH_TOKEN_PATTERN.findall(fold_search_text(text))
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SearchIndex:
+    """Inverted index of a deck's tokens with prefix (bisect) and trigram fuzzy matching
+
+    A query matches the cards containing every query token, where a token
+    matches exactly, as a prefix of a longer word, or, when neither finds
+    anything, through words with similar trigrams (typos).
+    """
+
+    def __init__(self, flashcards):
+        self.size = len(flashcards)
+        postings = {}
+        for i, card in enumerate(flashcards):
+            for token in {token for field in card for token in search_tokens(field)}:
+                postings.setdefault(token, []).append(i)
+        self.postings = postings  # token -> ascending card indices
+        self.vocabulary = sorted(postings)
+        self._trigrams = None  # (trigram -> words, word -> trigram count), built on the first fuzzy lookup
+        self._trigram_lock = threading.Lock()
+
+    def _prefix_matches(self, token):
+        """Cards containing a word that starts with token: a sorted list for one word, else a set"""
+        start = bisect.bisect_left(self.vocabulary, token)
+        end = bisect.bisect_left(self.vocabulary, token + "\U0010ffff")
+        if end - start == 1:
+            return self.postings[self.vocabulary[start]]
+        matches = set()
+        for word in self.vocabulary[start:end]:
+            matches.update(self.postings[word])
+        return matches
+
+    def _trigram_index(self):
+        """Build the trigram structures once; sessions share the index, so they are published together"""
+        if self._trigrams is None:
+            with self._trigram_lock:
+                if self._trigrams is None:
+                    index = {}
+                    counts = {}
+                    for word in self.vocabulary:
+                        grams = trigrams(word)
+                        counts[word] = len(grams)
+                        for gram in grams:
+                            index.setdefault(gram, []).append(word)
+                    self._trigrams = (index, counts)
+        return self._trigrams
+
+    def _fuzzy_matches(self, token):
+        """Cards containing a word whose trigram similarity to token is high enough"""
+        index, counts = self._trigram_index()
+        query_grams = trigrams(token)
+        shared = collections.Counter()
+        for gram in query_grams:
+            shared.update(index.get(gram, ()))
+        matches = set()
+        for word, count in shared.items():
+            similarity = count / (len(query_grams) + counts[word] - count)  # Jaccard
+            if similarity >= SEARCH_FUZZY_MIN_SIMILARITY:
+                matches.update(self.postings[word])
+        return matches
+
+    def search(self, query):
+        """Ascending indices of the cards matching query (every card for a blank query)"""
+        tokens = search_tokens(query)
+        if not tokens:
+            return list(range(self.size))
+        
+        candidates = []
+        for token in set(tokens):
+            if len(token) >= SEARCH_MIN_PREFIX:
+                matches = self._prefix_matches(token)
+            else:
+                matches = self.postings.get(token, [])
+            if not matches and len(token) >= 3:
+                matches = self._fuzzy_matches(token)
+            if not matches:
+                return []
+            candidates.append(matches)
+        
+        # Posting lists are already in card order, so a single one needs no sorting
+        if len(candidates) == 1 and isinstance(candidates[0], list):
+            return list(candidates[0])
+        candidates.sort(key=len)
+        result = set(candidates[0])
+        for matches in candidates[1:]:
+            result.intersection_update(matches)
+        return sorted(result)
+
+@st.cache_resource(max_entries=4)
+def get_search_index(deck_hash, _flashcards):
+    """Search index per deck; deck_hash stands in for hashing every card on each rerun"""
+    return SearchIndex(_flashcards)
+
+def search_flashcards(flashcards, query):
+    """Return indices of cards matching query in English, Arabic or transliteration"""
+    if not query.strip():
+        return list(range(len(flashcards)))
+    return get_search_index(deck_hash(flashcards), flashcards).search(query)
+
+# 📄 Search, page size and page navigation controls
+def paginate_flashcards(flashcards):
+    """Render pagination controls and return the indices of the cards on the current page"""
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        st.text_input(
+            "🔎 Search cards",
+            key="card_search",
+            on_change=reset_card_page,
+            help="Matches words and word beginnings in English, Arabic (with or without diacritics) "
+                 "and transliteration, and tolerates small typos",
+        )
+    with col2:
+        st.selectbox("Cards per page", CARD_PAGE_SIZES, key="card_page_size", on_change=reset_card_page)
+    with col3:
+        st.number_input(
+            "Jump to card #",
+            min_value=1,
+            max_value=max(1, len(flashcards)),
+            value=None,
+            step=1,
+            key="card_jump",
+            on_change=jump_to_card,
+        )
+    
+    matches = search_flashcards(flashcards, st.session_state.card_search)
+    page_size = st.session_state.card_page_size
+    total_pages = max(1, -(-len(matches) // page_size))
+    
+    # Keep the page in range when the deck or the search results shrink
+    st.session_state.card_page = min(max(1, st.session_state.card_page), total_pages)
+    page = st.session_state.card_page
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀️ Previous", key="card_page_prev", on_click=change_card_page, args=(-1,),
+                  disabled=page <= 1, use_container_width=True)
+    with col2:
+        st.number_input("Page", min_value=1, max_value=total_pages, step=1, key="card_page",
+                        label_visibility="collapsed")
+    with col3:
+        st.button("Next ▶️", key="card_page_next", on_click=change_card_page, args=(1,),
+                  disabled=page >= total_pages, use_container_width=True)
+    
+    start = (page - 1) * page_size
+    visible = matches[start:start + page_size]
+    if not matches:
+        st.info("No cards match your search.")
+    else:
+        filtered = f" (filtered from {len(flashcards)})" if len(matches) != len(flashcards) else ""
+        st.caption(f"Showing cards {start + 1}–{start + len(visible)} of {len(matches)}{filtered} · page {page} of {total_pages}")
+    return visible
+
+# 🔑 Widget keys and audio ids follow the card, not its position, so a hot reload
+# or a deck filter that shifts positions can't hand one card's state to another
+@functools.lru_cache(maxsize=65536)
+def card_key(card):
+    """Short id for a card from all three fields (cards may share English and Arabic)"""
+    return hashlib.sha1("\x00".join(card).encode("utf-8")).hexdigest()[:12]
+
 # 🎴 Display flashcards with voiceover
+@timed("show_flashcards")
 def show_flashcards(flashcards, reverse=False):
     st.title("📚 Bilingual Flashcards with Voiceover")
     st.write("🔹 Check the box below each card to reveal the translation and play sound.")
@@ -158,7 +2087,10 @@ def show_flashcards(flashcards, reverse=False):
         else:
             st.info("No audio currently playing")
     
-    for i, (english, arabic, translit) in enumerate(flashcards):
+    # Only the cards on the current page are rendered
+    for i in paginate_flashcards(flashcards):
+        english, arabic, translit = flashcards[i]
+        key = card_key(flashcards[i])
         with st.container():
             st.markdown('<div style="border:1px solid #ddd; padding:15px; border-radius:8px; margin-bottom:15px;">', unsafe_allow_html=True)
             
@@ -168,51 +2100,39 @@ def show_flashcards(flashcards, reverse=False):
                 st.markdown(f'<h3 style="color:#FF0000;">🔹 <strong>{english}</strong></h3>', unsafe_allow_html=True)
                 
                 # English voice controls
-                current_audio_id = f"card_{i}_en"
+                current_audio_id = f"card_{key}_en"
                 is_playing = st.session_state.audio_playing == current_audio_id
                 
                 col1, col2, col3 = st.columns([1, 1, 1])
                 with col1:
-                    voice_key = f"en_voice_{i}"
+                    voice_key = f"en_voice_{key}"
                     if st.button(f"🔊 Play English", key=voice_key, disabled=is_playing):
                         # Generate and store audio
                         audio_bytes = text_to_speech(english, lang="en")
                         if audio_bytes:
-                            st.session_state[f"audio_{current_audio_id}"] = audio_bytes
+                            hold_audio(current_audio_id, audio_bytes, english, "en")
                             st.session_state.audio_playing = current_audio_id
                             st.session_state.stop_requested = False
                             st.rerun()
                 
                 with col2:
                     if is_playing:
-                        if st.button(f"⏹️ Stop", key=f"stop_en_{i}", type="secondary"):
+                        if st.button(f"⏹️ Stop", key=f"stop_en_{key}", type="secondary"):
                             stop_audio()
                 
                 with col3:
                     # Download combined audio button
-                    download_key = f"download_{i}"
-                    combined_audio = generate_combined_audio(english, arabic)
-                    if combined_audio:
-                        filename = f"flashcard_{i+1}_english_arabic.mp3"
-                        b64 = base64.b64encode(combined_audio).decode()
-                        href = f'<a href="data:audio/mp3;base64,{b64}" download="{filename}" style="text-decoration:none;">'
-                        st.markdown(f'{href}<button style="background-color:#4CAF50; color:white; padding:5px 10px; border:none; border-radius:5px; cursor:pointer;">⬇️ Download Audio</button></a>', unsafe_allow_html=True)
+                    download_key = f"download_{key}"
+                    filename = f"flashcard_{i+1}_english_arabic.mp3"
+                    combined_audio_download_button(english, arabic, filename, key=download_key)
                 
                 # Show looping audio player if this audio is playing
                 if is_playing and not st.session_state.stop_requested:
-                    audio_bytes = st.session_state.get(f"audio_{current_audio_id}")
+                    audio_bytes = get_session_audio().get(current_audio_id)
                     if audio_bytes:
-                        # Create looping audio player
-                        audio_html = f"""
-                        <audio autoplay loop style="display:none;">
-                        <source src="data:audio/mp3;base64,{base64.b64encode(audio_bytes).decode()}" type="audio/mp3">
-                        Your browser does not support the audio element.
-                        </audio>
-                        """
-                        st.markdown(audio_html, unsafe_allow_html=True)
-                        st.success("🔁 Playing English audio on loop...")
-                
-                if st.checkbox("Show Arabic & Transliteration", key=f"en_ar_{i}"):
+                        play_looping_audio(audio_bytes, "🔁 Playing English audio on loop...")
+                
+                if st.checkbox("Show Arabic & Transliteration", key=f"en_ar_{key}"):
                     # Arabic text in RED
                     st.markdown(
                         f"""
@@ -223,38 +2143,30 @@ def show_flashcards(flashcards, reverse=False):
                     )
                     
                     # Arabic voice controls
-                    current_audio_id_ar = f"card_{i}_ar"
+                    current_audio_id_ar = f"card_{key}_ar"
                     is_playing_ar = st.session_state.audio_playing == current_audio_id_ar
                     
                     col1, col2 = st.columns([1, 1])
                     with col1:
-                        voice_key = f"ar_voice_{i}"
+                        voice_key = f"ar_voice_{key}"
                         if st.button(f"🔊 Play Arabic", key=voice_key, disabled=is_playing_ar):
                             audio_bytes = text_to_speech(arabic, lang="ar")
                             if audio_bytes:
-                                st.session_state[f"audio_{current_audio_id_ar}"] = audio_bytes
+                                hold_audio(current_audio_id_ar, audio_bytes, arabic, "ar")
                                 st.session_state.audio_playing = current_audio_id_ar
                                 st.session_state.stop_requested = False
                                 st.rerun()
                     
                     with col2:
                         if is_playing_ar:
-                            if st.button(f"⏹️ Stop", key=f"stop_ar_{i}", type="secondary"):
+                            if st.button(f"⏹️ Stop", key=f"stop_ar_{key}", type="secondary"):
                                 stop_audio()
                     
                     # Show looping audio player if Arabic audio is playing
                     if is_playing_ar and not st.session_state.stop_requested:
-                        audio_bytes = st.session_state.get(f"audio_{current_audio_id_ar}")
+                        audio_bytes = get_session_audio().get(current_audio_id_ar)
                         if audio_bytes:
-                            # Create looping audio player
-                            audio_html = f"""
-                            <audio autoplay loop style="display:none;">
-                            <source src="data:audio/mp3;base64,{base64.b64encode(audio_bytes).decode()}" type="audio/mp3">
-                            Your browser does not support the audio element.
-                            </audio>
-                            """
-                            st.markdown(audio_html, unsafe_allow_html=True)
-                            st.success("🔁 Playing Arabic audio on loop...")
+                            play_looping_audio(audio_bytes, "🔁 Playing Arabic audio on loop...")
             
             else:
                 # Arabic → English mode
@@ -265,50 +2177,38 @@ def show_flashcards(flashcards, reverse=False):
                 )
                 
                 # Arabic voice controls (first)
-                current_audio_id = f"card_{i}_ar_first"
+                current_audio_id = f"card_{key}_ar_first"
                 is_playing = st.session_state.audio_playing == current_audio_id
                 
                 col1, col2, col3 = st.columns([1, 1, 1])
                 with col1:
-                    voice_key = f"ar_voice_first_{i}"
+                    voice_key = f"ar_voice_first_{key}"
                     if st.button(f"🔊 Play Arabic", key=voice_key, disabled=is_playing):
                         audio_bytes = text_to_speech(arabic, lang="ar")
                         if audio_bytes:
-                            st.session_state[f"audio_{current_audio_id}"] = audio_bytes
+                            hold_audio(current_audio_id, audio_bytes, arabic, "ar")
                             st.session_state.audio_playing = current_audio_id
                             st.session_state.stop_requested = False
                             st.rerun()
                 
                 with col2:
                     if is_playing:
-                        if st.button(f"⏹️ Stop", key=f"stop_ar_first_{i}", type="secondary"):
+                        if st.button(f"⏹️ Stop", key=f"stop_ar_first_{key}", type="secondary"):
                             stop_audio()
                 
                 with col3:
                     # Download combined audio button
-                    download_key = f"download_reverse_{i}"
-                    combined_audio = generate_combined_audio(english, arabic)
-                    if combined_audio:
-                        filename = f"flashcard_{i+1}_arabic_english.mp3"
-                        b64 = base64.b64encode(combined_audio).decode()
-                        href = f'<a href="data:audio/mp3;base64,{b64}" download="{filename}" style="text-decoration:none;">'
-                        st.markdown(f'{href}<button style="background-color:#4CAF50; color:white; padding:5px 10px; border:none; border-radius:5px; cursor:pointer;">⬇️ Download Audio</button></a>', unsafe_allow_html=True)
+                    download_key = f"download_reverse_{key}"
+                    filename = f"flashcard_{i+1}_arabic_english.mp3"
+                    combined_audio_download_button(english, arabic, filename, key=download_key, arabic_first=True)
                 
                 # Show looping audio player if this audio is playing
                 if is_playing and not st.session_state.stop_requested:
-                    audio_bytes = st.session_state.get(f"audio_{current_audio_id}")
+                    audio_bytes = get_session_audio().get(current_audio_id)
                     if audio_bytes:
-                        # Create looping audio player
-                        audio_html = f"""
-                        <audio autoplay loop style="display:none;">
-                        <source src="data:audio/mp3;base64,{base64.b64encode(audio_bytes).decode()}" type="audio/mp3">
-                        Your browser does not support the audio element.
-                        </audio>
-                        """
-                        st.markdown(audio_html, unsafe_allow_html=True)
-                        st.success("🔁 Playing Arabic audio on loop...")
-                
-                if st.checkbox("Show English & Transliteration", key=f"ar_en_{i}"):
+                        play_looping_audio(audio_bytes, "🔁 Playing Arabic audio on loop...")
+                
+                if st.checkbox("Show English & Transliteration", key=f"ar_en_{key}"):
                     # English text in RED
                     st.markdown(
                         f"""
@@ -319,42 +2219,340 @@ def show_flashcards(flashcards, reverse=False):
                     )
                     
                     # English voice controls (second)
-                    current_audio_id_en = f"card_{i}_en_second"
+                    current_audio_id_en = f"card_{key}_en_second"
                     is_playing_en = st.session_state.audio_playing == current_audio_id_en
                     
                     col1, col2 = st.columns([1, 1])
                     with col1:
-                        voice_key = f"en_voice_second_{i}"
+                        voice_key = f"en_voice_second_{key}"
                         if st.button(f"🔊 Play English", key=voice_key, disabled=is_playing_en):
                             audio_bytes = text_to_speech(english, lang="en")
                             if audio_bytes:
-                                st.session_state[f"audio_{current_audio_id_en}"] = audio_bytes
+                                hold_audio(current_audio_id_en, audio_bytes, english, "en")
                                 st.session_state.audio_playing = current_audio_id_en
                                 st.session_state.stop_requested = False
                                 st.rerun()
                     
                     with col2:
                         if is_playing_en:
-                            if st.button(f"⏹️ Stop", key=f"stop_en_second_{i}", type="secondary"):
+                            if st.button(f"⏹️ Stop", key=f"stop_en_second_{key}", type="secondary"):
                                 stop_audio()
                     
                     # Show looping audio player if English audio is playing
                     if is_playing_en and not st.session_state.stop_requested:
-                        audio_bytes = st.session_state.get(f"audio_{current_audio_id_en}")
+                        audio_bytes = get_session_audio().get(current_audio_id_en)
                         if audio_bytes:
-                            # Create looping audio player
-                            audio_html = f"""
-                            <audio autoplay loop style="display:none;">
-                            <source src="data:audio/mp3;base64,{base64.b64encode(audio_bytes).decode()}" type="audio/mp3">
-                            Your browser does not support the audio element.
-                            </audio>
-                            """
-                            st.markdown(audio_html, unsafe_allow_html=True)
-                            st.success("🔁 Playing English audio on loop...")
+                            play_looping_audio(audio_bytes, "🔁 Playing English audio on loop...")
             
             st.markdown('</div>', unsafe_allow_html=True)
 
+# 🎯 Distractor index for quiz options
+class DistractorIndex:
+    """Unique English and Arabic answers, with O(k) sampling that excludes the correct answer"""
+
+    def __init__(self, flashcards):
+        self.pools = {
+            "en": list(dict.fromkeys(english for english, _, _ in flashcards)),
+            "ar": list(dict.fromkeys(arabic for _, arabic, _ in flashcards)),
+        }
+        # "Hard" distractors: answers with the same number of words as the correct one
+        self.buckets = {}
+        for lang, pool in self.pools.items():
+            buckets = {}
+            for answer in pool:
+                buckets.setdefault(len(answer.split()), []).append(answer)
+            self.buckets[lang] = buckets
+
+    @staticmethod
+    def _sample_from(pool, k, excluded, rng):
+        """Pick up to k distinct values from pool that are not in excluded"""
+        if k <= 0:
+            return []
+        # Small pools: filtering is cheap and avoids long rejection loops
+        if len(pool) < 4 * (k + len(excluded)):
+            candidates = [value for value in pool if value not in excluded]
+            return rng.sample(candidates, min(k, len(candidates)))
+        
+        # Large pools: rejection sampling touches about k entries
+        picked = []
+        seen = set(excluded)
+        while len(picked) < k:
+            value = pool[rng.randrange(len(pool))]
+            if value not in seen:
+                seen.add(value)
+                picked.append(value)
+        return picked
+
+    def sample(self, answer, lang, k=QUIZ_NUM_DISTRACTORS, hard=False, rng=random):
+        """Return up to k wrong answers in lang, never including answer"""
+        picked = []
+        if hard:
+            bucket = self.buckets[lang].get(len(answer.split()), [])
+            picked = self._sample_from(bucket, k, {answer}, rng)
+        picked += self._sample_from(self.pools[lang], k - len(picked), {answer, *picked}, rng)
+        return picked
+
+@st.cache_resource(max_entries=4)
+def get_distractor_index(flashcards):
+    """Distractor index for a deck, built once and shared by every session"""
+    return DistractorIndex(flashcards)
+
+# 📅 SM-2 scheduling step
+def sm2_schedule(interval_days, ease, repetitions, lapses, grade):
+    """Apply one review graded 0-5 and return the new (interval_days, ease, repetitions, lapses)"""
+    ease = max(SRS_MIN_EASE, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    if grade < 3:
+        # Forgotten: start over and review again shortly
+        return 0.0, ease, 0, lapses + 1
+    if repetitions == 0:
+        interval_days = 1.0
+    elif repetitions == 1:
+        interval_days = 6.0
+    else:
+        interval_days = interval_days * ease
+    return interval_days, ease, repetitions + 1, lapses
+
+@functools.lru_cache(maxsize=65536)
+def flashcard_id(card):
+    """Stable id for a card, from its English and Arabic text"""
+    english, arabic = card[0], card[1]
+    return hashlib.sha1(f"{english}\x00{arabic}".encode("utf-8")).hexdigest()[:16]
+
+# 📅 Review history and schedules stored in SQLite
+class ReviewStore:
+    """Append-only review log plus per-learner SM-2 card state with a due-date index"""
+
+    # Cards checked per query when looking for ones a learner has never reviewed
+    UNSEEN_BATCH = 500
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            # WAL lets several app processes read while one writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._migrate_shared_schedule()
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS reviews (
+                    id INTEGER PRIMARY KEY,
+                    learner TEXT NOT NULL DEFAULT '',
+                    card_id TEXT NOT NULL,
+                    reviewed_at REAL NOT NULL,
+                    grade INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS card_state (
+                    learner TEXT NOT NULL,
+                    card_id TEXT NOT NULL,
+                    due REAL NOT NULL,
+                    interval_days REAL NOT NULL,
+                    ease REAL NOT NULL,
+                    repetitions INTEGER NOT NULL,
+                    lapses INTEGER NOT NULL,
+                    PRIMARY KEY (learner, card_id)
+                );
+                CREATE INDEX IF NOT EXISTS card_state_learner_due ON card_state (learner, due);
+            """)
+
+    def _migrate_shared_schedule(self):
+        """Move a database from before per-learner schedules over; its rows keep the empty learner name"""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(card_state)")]
+        if not columns or "learner" in columns:
+            return
+        self._conn.executescript("""
+            ALTER TABLE reviews ADD COLUMN learner TEXT NOT NULL DEFAULT '';
+            DROP INDEX IF EXISTS card_state_due;
+            ALTER TABLE card_state RENAME TO card_state_shared;
+            CREATE TABLE card_state (
+                learner TEXT NOT NULL,
+                card_id TEXT NOT NULL,
+                due REAL NOT NULL,
+                interval_days REAL NOT NULL,
+                ease REAL NOT NULL,
+                repetitions INTEGER NOT NULL,
+                lapses INTEGER NOT NULL,
+                PRIMARY KEY (learner, card_id)
+            );
+            INSERT INTO card_state
+                SELECT '', card_id, due, interval_days, ease, repetitions, lapses FROM card_state_shared;
+            DROP TABLE card_state_shared;
+        """)
+
+    def record(self, learner, card_id, grade, now=None):
+        """Log a learner's review and reschedule the card for them; returns the new due timestamp"""
+        now = now or time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT interval_days, ease, repetitions, lapses FROM card_state WHERE learner = ? AND card_id = ?",
+                (learner, card_id),
+            ).fetchone()
+            interval_days, ease, repetitions, lapses = sm2_schedule(
+                *(row or (0.0, SRS_INITIAL_EASE, 0, 0)), grade
+            )
+            due = now + (interval_days * 86400 if interval_days else SRS_RELEARN_SECONDS)
+            self._conn.execute(
+                "INSERT INTO reviews (learner, card_id, reviewed_at, grade) VALUES (?, ?, ?, ?)",
+                (learner, card_id, now, grade),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO card_state "
+                "(learner, card_id, due, interval_days, ease, repetitions, lapses) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (learner, card_id, due, interval_days, ease, repetitions, lapses),
+            )
+        return due
+
+    def due_cards(self, learner, flashcards, n, now=None, rng=random):
+        """Return up to n cards for learner: overdue cards first (oldest first), then unseen cards"""
+        now = now or time.time()
+        by_id = {flashcard_id(card): card for card in flashcards}
+        picked = []
+        with self._lock:
+            # Page through the learner's due index; rows for cards of other decks are skipped
+            page = max(n, 50)
+            offset = 0
+            while len(picked) < n:
+                rows = self._conn.execute(
+                    "SELECT card_id FROM card_state WHERE learner = ? AND due <= ? "
+                    "ORDER BY due LIMIT ? OFFSET ?",
+                    (learner, now, page, offset),
+                ).fetchall()
+                for (card_id,) in rows:
+                    card = by_id.pop(card_id, None)
+                    if card is not None and len(picked) < n:
+                        picked.append(card)
+                if len(rows) < page:
+                    break
+                offset += page
+            
+            # Fill up with cards the learner has never reviewed, in random order,
+            # checking a batch of candidates per query until there are enough
+            candidates = list(by_id)
+            rng.shuffle(candidates)
+            for start in range(0, len(candidates), self.UNSEEN_BATCH):
+                if len(picked) >= n:
+                    break
+                batch = candidates[start:start + self.UNSEEN_BATCH]
+                seen = {card_id for (card_id,) in self._conn.execute(
+                    f"SELECT card_id FROM card_state WHERE learner = ? AND card_id IN ({','.join('?' * len(batch))})",
+                    (learner, *batch),
+                )}
+                picked.extend(by_id[card_id] for card_id in batch if card_id not in seen)
+        return picked[:n]
+
+@st.cache_resource
+def get_review_store():
+    """Process-wide review store"""
+    return ReviewStore(REVIEW_DB_PATH)
+
+def normalize_learner_name(name):
+    """Schedule key for a learner name: case and surrounding spaces don't matter"""
+    return " ".join(name.split()).casefold()
+
+def record_quiz_review(card, grade):
+    """Record a quiz outcome in the learner's schedule without interrupting the quiz on errors"""
+    learner = st.session_state.quiz_learner
+    if not learner:
+        return  # anonymous quizzes are not scheduled
+    try:
+        get_review_store().record(learner, flashcard_id(card), grade)
+    except sqlite3.Error as e:
+        st.warning(f"Could not save review progress: {e}")
+
+# 🧩 Directions and answer options for a whole quiz, generated once at quiz start
+def generate_quiz_plan(quiz_flashcards, quiz_type, index, hard=False, rng=random):
+    """Return (directions, options) with one entry per question"""
+    directions = []
+    options = []
+    for english, arabic, translit in quiz_flashcards:
+        if quiz_type == "Mixed":
+            # For mixed quiz, pick the direction for each question up front
+            direction = rng.choice(["English to Arabic", "Arabic to English"])
+        else:
+            direction = quiz_type
+        
+        if direction == "English to Arabic":
+            correct_answer, lang = arabic, "ar"
+        else:
+            correct_answer, lang = english, "en"
+        
+        question_options = [correct_answer] + index.sample(correct_answer, lang, hard=hard, rng=rng)
+        # Tiny decks: top up with stock answers
+        for fallback in QUIZ_FALLBACK_OPTIONS[lang]:
+            if len(question_options) > QUIZ_NUM_DISTRACTORS:
+                break
+            if fallback not in question_options:
+                question_options.append(fallback)
+        rng.shuffle(question_options)
+        
+        directions.append(direction)
+        options.append(question_options)
+    return directions, options
+
+# ⏩ Prepare upcoming quiz questions in the background
+@st.cache_resource
+def get_prefetch_executor():
+    """Small thread pool shared by every session for quiz prefetching"""
+    return ThreadPoolExecutor(max_workers=QUIZ_PREFETCH_WORKERS, thread_name_prefix="quiz-prefetch")
+
+def quiz_question_parts(card, direction):
+    """((prompt text, lang), (answer text, lang)) for a question asked in direction"""
+    english, arabic, _ = card
+    if direction == "English to Arabic":
+        return (english, "en"), (arabic, "ar")
+    return (arabic, "ar"), (english, "en")
+
+def prepare_quiz_question(card, direction, options):
+    """Everything a question needs to render at once: its texts, options and both recordings"""
+    (prompt, prompt_lang), (answer, answer_lang) = quiz_question_parts(card, direction)
+    return {
+        "prompt": prompt,
+        "answer": answer,
+        "options": options,
+        "prompt_audio": synthesize_speech(prompt, prompt_lang),
+        "answer_audio": synthesize_speech(answer, answer_lang),
+    }
+
+def prefetch_quiz_questions(current_index):
+    """Queue questions current_index..current_index + QUIZ_PREFETCH_AHEAD and drop the ones already passed"""
+    prefetch = st.session_state.quiz_prefetch
+    for index in [index for index in prefetch if index < current_index]:
+        prefetch.pop(index).cancel()
+    
+    quiz_flashcards = st.session_state.quiz_flashcards
+    last = min(current_index + QUIZ_PREFETCH_AHEAD, len(quiz_flashcards) - 1)
+    for index in range(current_index, last + 1):
+        if index not in prefetch:
+            prefetch[index] = get_prefetch_executor().submit(
+                prepare_quiz_question,
+                quiz_flashcards[index],
+                st.session_state.quiz_directions[index],
+                st.session_state.quiz_options[index],
+            )
+
+def quiz_question_audio(index, part):
+    """Prompt or answer audio for question index, from the prefetcher when it has finished"""
+    future = st.session_state.quiz_prefetch.get(index)
+    if future is not None and future.done() and not future.cancelled() and future.exception() is None:
+        get_metrics().inc("flashcards_quiz_prefetch_total", help="Quiz audio requests by prefetch outcome", result="hit")
+        return future.result()[f"{part}_audio"]
+    
+    # Not ready (or it failed): synthesize now, with the usual error reporting
+    get_metrics().inc("flashcards_quiz_prefetch_total", help="Quiz audio requests by prefetch outcome", result="miss")
+    card = st.session_state.quiz_flashcards[index]
+    prompt, answer = quiz_question_parts(card, st.session_state.quiz_directions[index])
+    text, lang = prompt if part == "prompt" else answer
+    return text_to_speech(text, lang)
+
+def quiz_audio_button(index, part, label):
+    """Button that plays the prompt or answer of question index once"""
+    if st.button(label, key=f"quiz_play_{part}_{index}"):
+        audio_bytes = quiz_question_audio(index, part)
+        if audio_bytes:
+            st.audio(audio_bytes, format="audio/mpeg", autoplay=True)
+
 # 📝 Quiz functionality - SIMPLIFIED without scoring
+@timed("show_quiz")
 def show_quiz(flashcards):
     st.title("📝 Language Learning Quiz")
     
@@ -376,29 +2574,98 @@ def show_quiz(flashcards):
                 max_value=min(20, len(flashcards)),
                 value=min(10, len(flashcards))
             )
+        learner_name = st.text_input(
+            "Your name:",
+            value=st.session_state.quiz_learner,
+            key="learner_name",
+            help="Answers are saved to your own review schedule under this name. Leave it empty to quiz without saving"
+        )
+        selection = st.radio(
+            "Choose cards:",
+            ["Random", "Due for review (spaced repetition)"],
+            horizontal=True,
+            help="Spaced repetition asks your overdue cards first, then cards you have not seen yet"
+        )
+        hard_distractors = st.checkbox(
+            "🎯 Harder options (wrong answers of similar length)",
+            help="Wrong answers are picked from phrases with the same number of words where possible"
+        )
+        listening = st.checkbox(
+            "🎧 Listening mode (hear the question instead of reading it)",
+            help="All question audio is prepared when the quiz starts"
+        )
         
         if st.button("🚀 Start Quiz", type="primary"):
-            st.session_state.quiz_started = True
-            st.session_state.quiz_completed = False
-            st.session_state.quiz_answers = {}
-            st.session_state.quiz_feedback = {}
-            st.session_state.current_question_index = 0
-            
-            # Select random flashcards for the quiz
-            if len(flashcards) <= num_questions:
+            learner = normalize_learner_name(learner_name)
+            # Select flashcards for the quiz
+            if selection != "Random" and not learner:
+                st.warning("Enter your name to review the cards due in your schedule.")
+                return
+            if selection != "Random":
+                quiz_flashcards = get_review_store().due_cards(learner, flashcards, num_questions)
+            elif len(flashcards) <= num_questions:
                 quiz_flashcards = flashcards.copy()
             else:
                 quiz_flashcards = random.sample(flashcards, num_questions)
             
-            st.session_state.quiz_flashcards = quiz_flashcards
-            st.session_state.quiz_type = quiz_type
-            st.rerun()
+            if not quiz_flashcards:
+                st.info("🎉 Nothing is due for review right now. Try a random quiz!")
+            else:
+                st.session_state.quiz_started = True
+                st.session_state.quiz_completed = False
+                st.session_state.quiz_answers = {}
+                st.session_state.quiz_feedback = {}
+                st.session_state.current_question_index = 0
+                
+                st.session_state.quiz_flashcards = quiz_flashcards
+                st.session_state.quiz_type = quiz_type
+                st.session_state.quiz_learner = learner
+                
+                # Fix each question's direction and options now, so they don't change between reruns
+                directions, options = generate_quiz_plan(
+                    quiz_flashcards, quiz_type, get_distractor_index(flashcards), hard=hard_distractors
+                )
+                st.session_state.quiz_directions = directions
+                st.session_state.quiz_options = options
+                st.session_state.quiz_listening = listening
+                
+                # Listening mode: render every prompt up front, in parallel, so no
+                # question waits for synthesis
+                if listening:
+                    prompts = [
+                        quiz_question_parts(card, direction)[0]
+                        for card, direction in zip(quiz_flashcards, directions)
+                    ]
+                    progress_bar = st.progress(0.0, text="Preparing question audio...")
+                    
+                    def update_progress(done, total):
+                        progress_bar.progress(done / total, text=f"Prepared audio for {done}/{total} questions")
+                    
+                    jobs = [functools.partial(synthesize_speech, text, lang) for text, lang in prompts]
+                    failed = sum(
+                        1 for _, _, error in synthesize_many(jobs, on_progress=update_progress) if error is not None
+                    )
+                    if failed:
+                        st.warning(f"⚠️ Audio for {failed} question(s) could not be prepared; it will be retried when shown.")
+                
+                # Start preparing the first questions while the page reruns
+                for future in st.session_state.quiz_prefetch.values():
+                    future.cancel()
+                st.session_state.quiz_prefetch = {}
+                prefetch_quiz_questions(0)
+                st.rerun()
     
     else:
         quiz_flashcards = st.session_state.quiz_flashcards
         quiz_type = st.session_state.quiz_type
         current_index = st.session_state.current_question_index
         
+        # Sessions started before quiz plans existed get one generated now
+        if len(st.session_state.quiz_options) != len(quiz_flashcards):
+            directions, options = generate_quiz_plan(quiz_flashcards, quiz_type, get_distractor_index(flashcards))
+            st.session_state.quiz_directions = directions
+            st.session_state.quiz_options = options
+        
         if not st.session_state.quiz_completed:
             # Show progress at the top (removed score)
             col1, col2 = st.columns([1, 1])
@@ -414,12 +2681,28 @@ def show_quiz(flashcards):
                 english, arabic, translit = quiz_flashcards[current_index]
                 question_num = current_index + 1
                 
+                # Prepare the next questions while this one is being answered
+                prefetch_quiz_questions(current_index)
+                
                 st.subheader(f"Question {question_num} of {len(quiz_flashcards)}")
                 
-                # Determine question type for this specific question
-                if quiz_type == "English to Arabic":
-                    # Always English to Arabic
-                    question_direction = "English to Arabic"
+                # Direction for this question was fixed when the quiz started
+                question_direction = st.session_state.quiz_directions[current_index]
+                listening = st.session_state.quiz_listening
+                # An answer picked in this rerun is stored further down, so check the radio too
+                answered = (current_index in st.session_state.quiz_answers
+                            or st.session_state.get(f"quiz_radio_{current_index}") is not None)
+                if listening and not answered:
+                    # Listening mode: the prompt is heard, and only shown once answered
+                    correct_answer = arabic if question_direction == "English to Arabic" else english
+                    answer_type = "Arabic" if question_direction == "English to Arabic" else "English"
+                    prompt_language = "English" if question_direction == "English to Arabic" else "Arabic"
+                    st.write(f"🎧 Listen to the {prompt_language} phrase. What is the {answer_type} translation?")
+                    audio_bytes = quiz_question_audio(current_index, "prompt")
+                    if audio_bytes:
+                        st.audio(audio_bytes, format="audio/mpeg", autoplay=True)
+                
+                elif question_direction == "English to Arabic":
                     question_text = english
                     correct_answer = arabic
                     answer_type = "Arabic"
@@ -427,36 +2710,16 @@ def show_quiz(flashcards):
                     st.markdown(f'<h3 style="color:#FF0000;">English: <strong>{english}</strong></h3>', unsafe_allow_html=True)
                     st.write(f"What is the {answer_type} translation?")
                     
-                elif quiz_type == "Arabic to English":
-                    # Always Arabic to English
-                    question_direction = "Arabic to English"
+                else:
                     question_text = arabic
                     correct_answer = english
                     answer_type = "English"
                     
                     st.markdown(f'<div style="text-align:right; direction:rtl; font-size:28px; color:#FF0000; font-weight:bold;">Arabic: {arabic}</div>', unsafe_allow_html=True)
                     st.write(f"What is the {answer_type} translation?")
-                    
-                else:  # Mixed quiz - random for each question
-                    # For mixed quiz, we need to decide direction for this specific question
-                    if random.choice([True, False]):
-                        # English to Arabic for this question
-                        question_direction = "English to Arabic"
-                        question_text = english
-                        correct_answer = arabic
-                        answer_type = "Arabic"
-                        
-                        st.markdown(f'<h3 style="color:#FF0000;">English: <strong>{english}</strong></h3>', unsafe_allow_html=True)
-                        st.write(f"What is the {answer_type} translation?")
-                    else:
-                        # Arabic to English for this question
-                        question_direction = "Arabic to English"
-                        question_text = arabic
-                        correct_answer = english
-                        answer_type = "English"
-                        
-                        st.markdown(f'<div style="text-align:right; direction:rtl; font-size:28px; color:#FF0000; font-weight:bold;">Arabic: {arabic}</div>', unsafe_allow_html=True)
-                        st.write(f"What is the {answer_type} translation?")
+                
+                if not listening:
+                    quiz_audio_button(current_index, "prompt", "🔊 Play Question")
                 
                 # Store correct answer for this question
                 st.session_state[f"correct_answer_{current_index}"] = correct_answer
@@ -474,6 +2737,7 @@ def show_quiz(flashcards):
                     # Show transliteration if available for Arabic answers
                     if question_direction == "English to Arabic" and translit:
                         st.write(f"*Transliteration: {translit}*")
+                    quiz_audio_button(current_index, "answer", "🔊 Play Answer")
                     
                     # Next Question button
                     col1, col2 = st.columns([1, 2])
@@ -491,24 +2755,8 @@ def show_quiz(flashcards):
                             st.rerun()
                 
                 else:
-                    # Not answered yet - show options for selection
-                    options = [correct_answer]
-                    other_flashcards = [f for f in flashcards if f != (english, arabic, translit)]
-                    
-                    if len(other_flashcards) >= 3:
-                        if question_direction == "English to Arabic":
-                            other_options = random.sample(other_flashcards, 3)
-                            options.extend([opt[1] for opt in other_options])
-                        else:
-                            other_options = random.sample(other_flashcards, 3)
-                            options.extend([opt[0] for opt in other_options])
-                    else:
-                        if question_direction == "English to Arabic":
-                            options.extend(["نَعَم", "لا", "شُكْرًا"])
-                        else:
-                            options.extend(["Yes", "No", "Thank you"])
-                    
-                    random.shuffle(options)
+                    # Not answered yet - show the options generated at quiz start
+                    options = st.session_state.quiz_options[current_index]
                     
                     # Use a unique key for the radio button
                     radio_key = f"quiz_radio_{current_index}"
@@ -530,12 +2778,22 @@ def show_quiz(flashcards):
                         # Store the answer
                         st.session_state.quiz_answers[current_index] = selected_answer
                         
+                        # Grade for spaced repetition: correct (4), correct after the hint (3), wrong (1)
+                        if selected_answer != correct_answer:
+                            grade = 1
+                        elif st.session_state.get(f"hint_{current_index}"):
+                            grade = 3
+                        else:
+                            grade = 4
+                        record_quiz_review(quiz_flashcards[current_index], grade)
+                        
                         # Show the correct answer immediately
                         st.info(f"**Correct answer:** {correct_answer}")
                         
                         # Show transliteration if available for Arabic answers
                         if question_direction == "English to Arabic" and translit:
                             st.write(f"*Transliteration: {translit}*")
+                        quiz_audio_button(current_index, "answer", "🔊 Play Answer")
                         
                         # Show Next Question button
                         if st.button("➡️ Next Question", key=f"next_{current_index}", type="primary"):
@@ -549,6 +2807,7 @@ def show_quiz(flashcards):
                     if st.button("⏭️ Skip Question", key=f"skip_{current_index}", type="secondary"):
                         # Mark as skipped
                         st.session_state.quiz_answers[current_index] = "SKIPPED"
+                        record_quiz_review(quiz_flashcards[current_index], 0)
                         # Move to next question
                         if current_index + 1 < len(quiz_flashcards):
                             st.session_state.current_question_index = current_index + 1
@@ -577,8 +2836,8 @@ def show_quiz(flashcards):
                         
                         # Get question direction for this question
                         question_direction = "English to Arabic"  # Default
-                        if i in st.session_state.quiz_feedback:
-                            question_direction = st.session_state.quiz_feedback[i].get("question_direction", "English to Arabic")
+                        if i < len(st.session_state.quiz_directions):
+                            question_direction = st.session_state.quiz_directions[i]
                         
                         st.markdown(f"**Q{i+1}:**")
                         
@@ -613,7 +2872,28 @@ def show_quiz(flashcards):
                     st.session_state.current_question_index = 0
                     st.rerun()
 
+# 🗜️ Assemble synthesized audio into a ZIP archive
+def build_audio_zip(jobs, filenames, max_workers=BULK_MAX_WORKERS, on_progress=None):
+    """Run synthesis jobs and store their audio under filenames; return (buffer, written, failures)"""
+    # Stream entries straight into an in-memory archive as audio arrives.
+    # MP3 is already compressed, so entries are STORED rather than DEFLATEd.
+    zip_buffer = io.BytesIO()
+    written = 0
+    failures = []
+    with zipfile.ZipFile(zip_buffer, 'w', compression=zipfile.ZIP_STORED) as zipf:
+        # Entries are written in card order as their audio completes
+        results = synthesize_many(jobs, max_workers=max_workers, on_progress=on_progress)
+        for i, audio_bytes, error in results:
+            if audio_bytes:
+                zipf.writestr(filenames[i], audio_bytes)
+                written += 1
+            else:
+                failures.append((i, error))
+    zip_buffer.seek(0)
+    return zip_buffer, written, failures
+
 # 📥 Bulk download functionality
+@timed("show_bulk_download")
 def show_bulk_download(flashcards):
     st.title("📥 Bulk Audio Download")
     st.write("Download all flashcards as audio files")
@@ -631,79 +2911,201 @@ def show_bulk_download(flashcards):
             ["With numbers (flashcard_01.mp3)", "With text (hello_مرحبا.mp3)"]
         )
     
+    max_workers = st.slider(
+        "Parallel synthesis requests:",
+        min_value=1,
+        max_value=16,
+        value=BULK_MAX_WORKERS,
+        help="How many cards are synthesized at the same time"
+    )
+    
     if st.button("🛠️ Generate Download Package", type="primary"):
         with st.spinner("Generating audio files..."):
-            import zipfile
-            import tempfile
-            import os
+            # Build one synthesis job and file name per card
+            jobs = []
+            filenames = []
+            use_numbers = file_format == "With numbers (flashcard_01.mp3)"
+            for i, (english, arabic, translit) in enumerate(flashcards):
+                # Clean text for filename
+                clean_english = re.sub(r'[^\w\s-]', '', english)[:30]
+                clean_arabic = re.sub(r'[^\w\s-]', '', arabic)[:30]
+                
+                # Generate audio based on type
+                if download_type == "English only":
+                    jobs.append(functools.partial(synthesize_speech, english, "en"))
+                    filenames.append(f"flashcard_{i+1:02d}_english.mp3" if use_numbers else f"{clean_english}_english.mp3")
+                elif download_type == "Arabic only":
+                    jobs.append(functools.partial(synthesize_speech, arabic, "ar"))
+                    filenames.append(f"flashcard_{i+1:02d}_arabic.mp3" if use_numbers else f"{clean_arabic}_arabic.mp3")
+                elif download_type == "English then Arabic":
+                    jobs.append(functools.partial(render_combined_audio, english, arabic))
+                    filenames.append(f"flashcard_{i+1:02d}_english_arabic.mp3" if use_numbers else f"{clean_english}_{clean_arabic}.mp3")
+                elif download_type == "Arabic then English":
+                    jobs.append(functools.partial(render_combined_audio, english, arabic, arabic_first=True))
+                    filenames.append(f"flashcard_{i+1:02d}_arabic_english.mp3" if use_numbers else f"{clean_arabic}_{clean_english}.mp3")
             
-            # Create temporary directory for files
-            with tempfile.TemporaryDirectory() as tmpdir:
-                zip_filename = f"flashcards_audio_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-                zip_path = os.path.join(tmpdir, zip_filename)
-                
-                with zipfile.ZipFile(zip_path, 'w') as zipf:
-                    for i, (english, arabic, translit) in enumerate(flashcards):
-                        # Clean text for filename
-                        clean_english = re.sub(r'[^\w\s-]', '', english)[:30]
-                        clean_arabic = re.sub(r'[^\w\s-]', '', arabic)[:30]
-                        
-                        # Generate audio based on type
-                        if download_type == "English only":
-                            audio_bytes = text_to_speech(english, lang="en")
-                            if audio_bytes:
-                                if file_format == "With numbers (flashcard_01.mp3)":
-                                    filename = f"flashcard_{i+1:02d}_english.mp3"
-                                else:
-                                    filename = f"{clean_english}_english.mp3"
-                                zipf.writestr(filename, audio_bytes)
-                        
-                        elif download_type == "Arabic only":
-                            audio_bytes = text_to_speech(arabic, lang="ar")
-                            if audio_bytes:
-                                if file_format == "With numbers (flashcard_01.mp3)":
-                                    filename = f"flashcard_{i+1:02d}_arabic.mp3"
-                                else:
-                                    filename = f"{clean_arabic}_arabic.mp3"
-                                zipf.writestr(filename, audio_bytes)
-                        
-                        elif download_type == "English then Arabic":
-                            audio_bytes = generate_combined_audio(english, arabic)
-                            if audio_bytes:
-                                if file_format == "With numbers (flashcard_01.mp3)":
-                                    filename = f"flashcard_{i+1:02d}_english_arabic.mp3"
-                                else:
-                                    filename = f"{clean_english}_{clean_arabic}.mp3"
-                                zipf.writestr(filename, audio_bytes)
-                        
-                        elif download_type == "Arabic then English":
-                            # Generate Arabic then English
-                            arabic_audio = text_to_speech(arabic, lang="ar")
-                            english_audio = text_to_speech(english, lang="en")
-                            if arabic_audio and english_audio:
-                                combined_bytes = arabic_audio + english_audio
-                                if file_format == "With numbers (flashcard_01.mp3)":
-                                    filename = f"flashcard_{i+1:02d}_arabic_english.mp3"
-                                else:
-                                    filename = f"{clean_arabic}_{clean_english}.mp3"
-                                zipf.writestr(filename, combined_bytes)
-                
-                # Read the zip file
-                with open(zip_path, 'rb') as f:
-                    zip_data = f.read()
-                
-                # Provide download link
-                b64_zip = base64.b64encode(zip_data).decode()
-                href = f'<a href="data:application/zip;base64,{b64_zip}" download="{zip_filename}" style="text-decoration:none;">'
-                st.markdown(f'{href}<button style="background-color:#2196F3; color:white; padding:10px 20px; border:none; border-radius:5px; font-size:16px; cursor:pointer;">⬇️ Download All Audio Files ({len(flashcards)} files)</button></a>', unsafe_allow_html=True)
-                
-                st.success(f"✅ Generated {len(flashcards)} audio files!")
-                st.info("The zip file contains all audio files in MP3 format.")
+            progress_bar = st.progress(0.0, text="Starting...")
+            
+            def update_progress(done, total):
+                progress_bar.progress(done / total, text=f"Synthesized {done}/{total} cards")
+            
+            zip_filename = f"flashcards_audio_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+            
+            zip_buffer, written, failures = build_audio_zip(
+                jobs, filenames, max_workers=max_workers, on_progress=update_progress
+            )
+            
+            # Provide download button (served by URL, not embedded in the page)
+            st.download_button(
+                f"⬇️ Download All Audio Files ({written} files)",
+                data=zip_buffer,
+                file_name=zip_filename,
+                mime="application/zip",
+                type="primary",
+                on_click="ignore",
+            )
+            
+            st.success(f"✅ Generated {written} audio files!")
+            if failures:
+                i, error = failures[0]
+                st.warning(f"⚠️ {len(failures)} card(s) could not be synthesized (card {i+1}: {error})")
+            st.info("The zip file contains all audio files in MP3 format.")
+
+# 🎧 Play the whole deck as one recording
+@timed("show_deck_player")
+def show_deck_player(flashcards):
+    st.title("🎧 Play Deck")
+    st.write("Listen to every card in one continuous recording: phrase, pause, translation, then the next card.")
+    
+    order = st.radio("Order:", ["English then Arabic", "Arabic then English"], horizontal=True, key="playlist_order")
+    arabic_first = order == "Arabic then English"
+    key = get_deck_playlist_key(deck_hash(flashcards), arabic_first, flashcards)
+    
+    # A playlist another session already built is picked up from the audio cache
+    if st.session_state.get("playlist_key") != key and get_audio_cache().contains(key):
+        audio_bytes, chapters = render_deck_playlist(flashcards, arabic_first)
+        get_session_audio().put("playlist", audio_bytes, functools.partial(get_audio_cache().get, key))
+        st.session_state.playlist_key = key
+        st.session_state.playlist_chapters = chapters
+    
+    if st.session_state.get("playlist_key") != key:
+        st.info(f"The playlist for these {len(flashcards)} cards has not been built yet.")
+        if st.button("🛠️ Build Playlist", type="primary"):
+            progress_bar = st.progress(0.0, text="Starting...")
+            
+            def update_progress(done, total):
+                progress_bar.progress(done / total, text=f"Prepared {done}/{total} phrases")
+            
+            try:
+                audio_bytes, chapters = render_deck_playlist(flashcards, arabic_first, on_progress=update_progress)
+            except TTSUnavailable as e:
+                st.warning(f"🔇 {e}")
+                return
+            except Exception as e:
+                st.error(f"Error building playlist: {e}")
+                return
+            get_session_audio().put("playlist", audio_bytes, functools.partial(get_audio_cache().get, key))
+            st.session_state.playlist_key = key
+            st.session_state.playlist_chapters = chapters
+            st.rerun()
+        return
+    
+    chapters = st.session_state.playlist_chapters
+    audio_bytes = get_session_audio().get("playlist")
+    if not audio_bytes or not chapters:
+        # Evicted from the audio cache since it was built
+        st.session_state.playlist_key = None
+        st.rerun()
+    
+    card = st.selectbox(
+        "Start from card:",
+        range(len(chapters)),
+        format_func=lambda i: chapters[i][2],
+        key="playlist_start",
+    )
+    # The browser fetches the recording by URL with range requests, so seeking is free
+    st.audio(audio_bytes, format="audio/mpeg", start_time=chapters[card][0] / 1000)
+    total_seconds = chapters[-1][1] / 1000
+    st.caption(f"{len(chapters)} cards, {int(total_seconds // 60)}:{int(total_seconds % 60):02d} in total. "
+               "Chapter markers are included when the file is downloaded.")
+    st.download_button(
+        "⬇️ Download Playlist",
+        data=audio_bytes,
+        file_name="flashcards_playlist.mp3",
+        mime="audio/mpeg",
+        key="download_playlist",
+        on_click="ignore",
+    )
+
+# 🔄 Rerun open sessions when the watcher has loaded a newer deck
+@st.fragment(run_every=DECK_WATCH_INTERVAL_SECONDS or None)
+def watch_deck_updates():
+    """Poll the deck watcher; as a fragment, only this function reruns on the timer"""
+    watcher = get_deck_watcher(DECK_SOURCE)
+    if st.session_state.deck_version is None:
+        st.session_state.deck_version = watcher.version
+    elif st.session_state.deck_version != watcher.version:
+        st.session_state.deck_version = watcher.version
+        st.session_state.deck_update_message = deck_update_message(watcher.last_diff)
+        st.rerun(scope="app")
+
+# 📈 Metrics export
+def prometheus_metrics():
+    """All metrics in Prometheus text format, including cache and TTS service state"""
+    cache_stats = get_audio_cache().stats()
+    flight_stats = get_synthesis_flights().stats()
+    guard_stats = get_tts_guard().stats()
+    memory_stats = get_audio_memory_accountant().stats()
+    gauges = [
+        ("flashcards_audio_cache_hits", "Audio cache hits since start", cache_stats["hits"]),
+        ("flashcards_audio_cache_misses", "Audio cache misses since start", cache_stats["misses"]),
+        ("flashcards_audio_cache_evictions", "Audio cache evictions since start", cache_stats["evictions"]),
+        ("flashcards_audio_cache_bytes", "Audio cache size on disk", cache_stats["bytes"]),
+        ("flashcards_synthesis_coalesced", "Synthesis calls that shared an in-flight call", flight_stats["coalesced"]),
+        ("flashcards_tts_breaker_open", "1 if the TTS circuit breaker is open", int(guard_stats["state"] == "open")),
+        ("flashcards_tts_breaker_rejected", "Calls rejected by the open circuit breaker", guard_stats["breaker_rejected"]),
+        ("flashcards_tts_rate_limited", "Calls rejected by the TTS rate limiter", guard_stats["rate_limited"]),
+        ("flashcards_session_audio_bytes", "Playback audio held in memory by all sessions", memory_stats["bytes"]),
+        ("flashcards_sessions", "Sessions holding playback audio", memory_stats["sessions"]),
+    ]
+    return get_metrics().to_prometheus(gauges)
+
+def write_metrics_file(path):
+    """Atomically rewrite path for node_exporter's textfile collector"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(prometheus_metrics())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
 
 # 🚀 Run the app
 if __name__ == "__main__":
+    rerun_started = time.perf_counter()
     try:
-        flashcards = load_flashcards(doc_path)
+        deck = load_deck(DECK_SOURCE)
+        for path, error in deck.errors:
+            if path in deck.stale:
+                st.warning(f"⚠️ Could not read `{path}` ({error}), showing its last readable version")
+            else:
+                st.warning(f"⚠️ Could not read `{path}`: {error}")
+        
+        # Pick up edits to the documents without restarting the app
+        if DECK_WATCH_INTERVAL_SECONDS > 0:
+            watch_deck_updates()
+        if 'deck_update_message' in st.session_state:
+            st.toast(st.session_state.pop('deck_update_message'))
+        
+        # Filter by source document when the deck is made of several
+        flashcards = deck.flashcards
+        if len(deck.names) > 1:
+            with st.sidebar:
+                selected_decks = st.multiselect("📚 Decks", deck.names, default=deck.names)
+            flashcards = deck.select(selected_decks)
         
         if not flashcards:
             st.warning("⚠️ No flashcards loaded. Check document format.")
@@ -711,18 +3113,21 @@ if __name__ == "__main__":
             st.success(f"✅ Loaded {len(flashcards)} flashcards with voiceover!")
             
             # Create tabs for different functionalities
-            tab1, tab2, tab3, tab4 = st.tabs(["🎴 Flashcards", "📝 Quiz", "📥 Bulk Download", "⚙️ Settings"])
+            tab1, tab2, tab3, tab4, tab5 = st.tabs(
+                ["🎴 Flashcards", "📝 Quiz", "🎧 Play Deck", "📥 Bulk Download", "⚙️ Settings"]
+            )
             
             with tab1:
                 # Voiceover settings
                 with st.expander("⚙️ Voice Settings"):
-                    st.info("Note: Voice synthesis uses Google Text-to-Speech (gTTS)")
+                    st.info(f"Note: Voice synthesis uses {get_tts_backend().label}")
                     st.write("✅ Emojis are automatically removed from voice output")
                     st.write("🔁 Audio loops continuously until Stop button is clicked")
                     st.write("Example: 'Hello 👋' will speak as 'Hello'")
                     st.write("English voice: Standard English TTS")
                     st.write("Arabic voice: Standard Arabic TTS")
                     st.write("Internet connection is required for voice generation.")
+                    st.write("💾 Generated audio is cached on disk and reused across sessions.")
                 
                 # Preview first parsed card
                 with st.expander("🔍 Preview first card with voice"):
@@ -739,7 +3144,7 @@ if __name__ == "__main__":
                         if st.button("🔊 Play English", key="preview_en", disabled=is_preview_playing):
                             audio_bytes = text_to_speech(en, lang="en")
                             if audio_bytes:
-                                st.session_state[f"audio_{preview_audio_id}"] = audio_bytes
+                                hold_audio(preview_audio_id, audio_bytes, en, "en")
                                 st.session_state.audio_playing = preview_audio_id
                                 st.session_state.stop_requested = False
                                 st.rerun()
@@ -751,24 +3156,15 @@ if __name__ == "__main__":
                     
                     with col3:
                         # Download preview audio
-                        combined_audio = generate_combined_audio(en, ar)
-                        if combined_audio:
-                            filename = f"preview_english_arabic.mp3"
-                            b64 = base64.b64encode(combined_audio).decode()
-                            href = f'<a href="data:audio/mp3;base64,{b64}" download="{filename}" style="text-decoration:none;">'
-                            st.markdown(f'{href}<button style="background-color:#4CAF50; color:white; padding:5px 10px; border:none; border-radius:5px; cursor:pointer;">⬇️ Preview Audio</button></a>', unsafe_allow_html=True)
+                        combined_audio_download_button(
+                            en, ar, "preview_english_arabic.mp3", key="download_preview", label="⬇️ Preview Audio"
+                        )
                     
                     # Show looping audio player for preview
                     if is_preview_playing and not st.session_state.stop_requested:
-                        audio_bytes = st.session_state.get(f"audio_{preview_audio_id}")
+                        audio_bytes = get_session_audio().get(preview_audio_id)
                         if audio_bytes:
-                            audio_html = f"""
-                            <audio autoplay loop style="display:none;">
-                            <source src="data:audio/mp3;base64,{base64.b64encode(audio_bytes).decode()}" type="audio/mp3">
-                            </audio>
-                            """
-                            st.markdown(audio_html, unsafe_allow_html=True)
-                            st.success("🔁 Playing English preview on loop...")
+                            play_looping_audio(audio_bytes, "🔁 Playing English preview on loop...")
                     
                     st.markdown(f'<div style="text-align:right; direction:rtl; color:#FF0000; font-weight:bold;">Arabic (display): {ar}</div>', unsafe_allow_html=True)
                     st.text(f"Arabic (for voice): {remove_emojis(ar)}")
@@ -782,7 +3178,7 @@ if __name__ == "__main__":
                         if st.button("🔊 Play Arabic", key="preview_ar", disabled=is_preview_playing_ar):
                             audio_bytes = text_to_speech(ar, lang="ar")
                             if audio_bytes:
-                                st.session_state[f"audio_{preview_audio_id_ar}"] = audio_bytes
+                                hold_audio(preview_audio_id_ar, audio_bytes, ar, "ar")
                                 st.session_state.audio_playing = preview_audio_id_ar
                                 st.session_state.stop_requested = False
                                 st.rerun()
@@ -794,15 +3190,9 @@ if __name__ == "__main__":
                     
                     # Show looping audio player for Arabic preview
                     if is_preview_playing_ar and not st.session_state.stop_requested:
-                        audio_bytes = st.session_state.get(f"audio_{preview_audio_id_ar}")
+                        audio_bytes = get_session_audio().get(preview_audio_id_ar)
                         if audio_bytes:
-                            audio_html = f"""
-                            <audio autoplay loop style="display:none;">
-                            <source src="data:audio/mp3;base64,{base64.b64encode(audio_bytes).decode()}" type="audio/mp3">
-                            </audio>
-                            """
-                            st.markdown(audio_html, unsafe_allow_html=True)
-                            st.success("🔁 Playing Arabic preview on loop...")
+                            play_looping_audio(audio_bytes, "🔁 Playing Arabic preview on loop...")
                     
                     st.text(f"Transliteration: {tr}")
                 
@@ -814,13 +3204,90 @@ if __name__ == "__main__":
                 show_quiz(flashcards)
             
             with tab3:
-                show_bulk_download(flashcards)
+                show_deck_player(flashcards)
             
             with tab4:
+                show_bulk_download(flashcards)
+            
+            with tab5:
                 st.subheader("⚙️ Application Settings")
                 st.info("Flashcards loaded successfully!")
                 st.metric("Total Flashcards", len(flashcards))
                 
+                st.write(f"🗣️ TTS backend: **{get_tts_backend().label}**")
+                st.caption(f"Available backends: {', '.join(available_tts_backends())} (set FLASHCARDS_TTS_BACKEND to choose)")
+                
+                # Audio cache statistics
+                cache_stats = get_audio_cache().stats()
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Audio Cache Hits", cache_stats["hits"])
+                with col2:
+                    st.metric("Audio Cache Misses", cache_stats["misses"])
+                with col3:
+                    st.metric("Audio Cache Size", f"{cache_stats['bytes'] / (1024 * 1024):.1f} MB")
+                
+                # Playback audio held in memory
+                session_audio = get_session_audio()
+                memory_stats = get_audio_memory_accountant().stats()
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Session Audio Memory", f"{session_audio.size / (1024 * 1024):.1f} MB")
+                with col2:
+                    st.metric("Server Audio Memory", f"{memory_stats['bytes'] / (1024 * 1024):.1f} MB")
+                with col3:
+                    st.metric("Active Sessions", memory_stats["sessions"])
+                
+                # Rate limiter and circuit breaker around the TTS backend
+                guard_stats = get_tts_guard().stats()
+                state_icons = {"closed": "🟢", "half-open": "🟡", "open": "🔴"}
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Voice Service", f"{state_icons[guard_stats['state']]} {guard_stats['state']}")
+                with col2:
+                    st.metric("Rejected (breaker open)", guard_stats["breaker_rejected"])
+                with col3:
+                    st.metric("Rejected (rate limit)", guard_stats["rate_limited"])
+                if guard_stats["transitions"]:
+                    with st.expander("🚦 Circuit breaker history"):
+                        for when, state in reversed(guard_stats["transitions"]):
+                            st.write(f"{when.strftime('%H:%M:%S')} → {state}")
+                
+                # Identical synthesis requests that waited on one already in flight
+                flight_stats = get_synthesis_flights().stats()
+                st.caption(
+                    f"🤝 Synthesis requests: {flight_stats['calls']}, "
+                    f"coalesced with one in flight: {flight_stats['coalesced']}"
+                )
+                
+                # Hot reload status
+                if DECK_WATCH_INTERVAL_SECONDS > 0:
+                    watcher = get_deck_watcher(DECK_SOURCE)
+                    if watcher.last_diff is not None:
+                        st.caption(f"🔄 {deck_update_message(watcher.last_diff)} at {watcher.last_change.strftime('%H:%M:%S')}")
+                    else:
+                        st.caption(f"🔄 Watching `{DECK_SOURCE}` for changes every {DECK_WATCH_INTERVAL_SECONDS:g}s")
+                    if watcher.last_error:
+                        st.warning(f"⚠️ Could not reload the deck: {watcher.last_error}")
+                
+                # Where time goes in a rerun
+                with st.expander("📈 Performance"):
+                    timings = get_metrics().timings()
+                    if timings:
+                        st.dataframe(timings, hide_index=True)
+                    else:
+                        st.write("No timings recorded yet.")
+                    st.download_button(
+                        "⬇️ Prometheus metrics",
+                        data=prometheus_metrics,
+                        file_name="flashcards_metrics.prom",
+                        mime="text/plain",
+                        key="download_metrics",
+                        on_click="ignore",
+                    )
+                    if METRICS_FILE:
+                        st.caption(f"Also written to `{METRICS_FILE}` after every rerun.")
+                
                 # Display first few flashcards as sample
                 with st.expander("📋 Sample Flashcards"):
                     for i, (en, ar, tr) in enumerate(flashcards[:5]):
@@ -837,7 +3304,13 @@ if __name__ == "__main__":
                     st.rerun()
         
     except FileNotFoundError:
-        st.error(f"❌ File not found: `{doc_path}`")
-        st.info("Update the `doc_path` variable with the correct path.")
+        st.error(f"❌ File not found: `{DECK_SOURCE}`")
+        st.info("Update the `doc_path` variable or set FLASHCARDS_DECK to a document, directory or glob.")
     except Exception as e:
         st.error(f"❌ Error: {e}")
+    finally:
+        # Also runs when a button triggers st.rerun()
+        record_duration("rerun", time.perf_counter() - rerun_started)
+        if METRICS_FILE:
+            with contextlib.suppress(OSError):
+                write_metrics_file(METRICS_FILE)
@@ -0,0 +1,104 @@
+# prerender_audio.py
+"""Synthesize a whole deck ahead of time into the shared audio cache
+
+The Streamlit app reads from the same cache, so no learner has to wait for
+the first "Play" of a phrase.
+
+    python prerender_audio.py                        # incremental, default document
+    python prerender_audio.py "Other Deck.docx" --workers 8
+    python prerender_audio.py decks/                 # every .docx in a directory
+    python prerender_audio.py --force                # re-synthesize everything
+"""
+import argparse
+import functools
+import os
+import sys
+import time
+
+# Importing the app outside `streamlit run` logs bare-mode warnings on every
+# session_state access; they are irrelevant for a command-line tool
+from streamlit import logger as streamlit_logger
+streamlit_logger.set_log_level("error")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import bilingual_flashcards_from_docx as app
+
+def plan_jobs(flashcards, force=False):
+    """Return (single_jobs, combined_jobs, skipped) for every phrase missing from the cache
+
+    Each job is a (cache_key, callable) pair. Phrases are de-duplicated by cache
+    key, so repeated phrases are only synthesized once.
+    """
+    cache = app.get_audio_cache()
+    single_jobs = {}
+    combined_jobs = {}
+    skipped = 0
+    for english, arabic, _ in flashcards:
+        for text, lang in ((english, "en"), (arabic, "ar")):
+            key = app.speech_audio_key(text, lang)
+            if key not in single_jobs:
+                single_jobs[key] = functools.partial(app.synthesize_speech, text, lang)
+        for arabic_first in (False, True):
+            key = app.combined_audio_key(english, arabic, arabic_first)
+            if key not in combined_jobs:
+                combined_jobs[key] = functools.partial(app.render_combined_audio, english, arabic, arabic_first=arabic_first)
+
+    # Incremental mode: the cache is content-addressed, so anything already
+    # stored was rendered from identical text and voice settings
+    for jobs in (single_jobs, combined_jobs):
+        for key in list(jobs):
+            if force:
+                cache.delete(key)
+            elif cache.contains(key):
+                del jobs[key]
+                skipped += 1
+    return list(single_jobs.items()), list(combined_jobs.items()), skipped
+
+def run_jobs(label, jobs, workers):
+    """Run jobs on the app's synthesis scheduler, printing progress; return the failure count"""
+    if not jobs:
+        return 0
+
+    def report(done, total):
+        print(f"\r{label}: {done}/{total}", end="", flush=True)
+
+    failures = 0
+    callables = [job for _, job in jobs]
+    for i, audio, error in app.synthesize_many(callables, max_workers=workers, on_progress=report):
+        if error is not None:
+            failures += 1
+            print(f"\n  failed: {jobs[i][1].args[0]!r} ({error})", file=sys.stderr)
+    print()
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render flashcard audio into the shared audio cache")
+    parser.add_argument("source", nargs="?", default=app.DECK_SOURCE, help="Word document, directory or glob with the flashcards")
+    parser.add_argument("--workers", type=int, default=app.BULK_MAX_WORKERS, help="concurrent synthesis requests")
+    parser.add_argument("--force", action="store_true", help="re-synthesize phrases that are already cached")
+    parser.add_argument("--backend", choices=sorted(app.TTS_BACKENDS), help="TTS backend (default: FLASHCARDS_TTS_BACKEND)")
+    args = parser.parse_args(argv)
+
+    if args.backend:
+        app.TTS_BACKEND = args.backend
+
+    start = time.perf_counter()
+    deck = app.load_deck(args.source)
+    for path, error in deck.errors:
+        print(f"Could not read {path}: {error}", file=sys.stderr)
+    flashcards = deck.flashcards
+    print(f"Loaded {len(flashcards)} flashcards from {args.source}")
+
+    single_jobs, combined_jobs, skipped = plan_jobs(flashcards, force=args.force)
+    print(f"{len(single_jobs)} phrases and {len(combined_jobs)} combined recordings to render, {skipped} already cached")
+
+    # Single phrases first, so combined recordings are assembled from cached audio
+    failures = run_jobs("Phrases", single_jobs, args.workers)
+    failures += run_jobs("Combined", combined_jobs, args.workers)
+
+    rendered = len(single_jobs) + len(combined_jobs) - failures
+    print(f"Rendered {rendered}, skipped {skipped}, failed {failures} in {time.perf_counter() - start:.1f}s")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
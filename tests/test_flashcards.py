@@ -0,0 +1,264 @@
+# tests/test_flashcards.py
+"""Tests for the app's pure logic, run on the fake TTS backend
+
+    python -m pytest
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+# Importing the app outside `streamlit run` logs bare-mode warnings on every
+# session_state access; they are irrelevant here
+from streamlit import logger as streamlit_logger
+streamlit_logger.set_log_level("error")
+
+# Isolate the run before the app reads its configuration
+os.environ["FLASHCARDS_CACHE_DIR"] = tempfile.mkdtemp(prefix="flashcards-test-")
+os.environ["FLASHCARDS_TTS_BACKEND"] = "fake"
+os.environ.pop("FLASHCARDS_METRICS_FILE", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bilingual_flashcards_from_docx as app
+
+HELLO = ("Hello 👋", "مَرْحَبًا", "marhaban")
+THANKS = ("Thank you", "شُكْرًا", "shukran")
+YES = ("Yes", "نَعَم", "na‘am")
+
+# 📅 SM-2 scheduling
+def test_sm2_first_reviews_use_fixed_intervals():
+    interval, ease, repetitions, lapses = app.sm2_schedule(0.0, app.SRS_INITIAL_EASE, 0, 0, 5)
+    assert (interval, repetitions, lapses) == (1.0, 1, 0)
+    interval, ease, repetitions, lapses = app.sm2_schedule(interval, ease, repetitions, lapses, 5)
+    assert (interval, repetitions) == (6.0, 2)
+    interval, ease, repetitions, lapses = app.sm2_schedule(interval, ease, repetitions, lapses, 4)
+    assert interval == pytest.approx(6.0 * ease)
+
+def test_sm2_forgotten_card_starts_over():
+    interval, ease, repetitions, lapses = app.sm2_schedule(15.0, 2.5, 4, 0, 1)
+    assert (interval, repetitions, lapses) == (0.0, 0, 1)
+    assert ease < 2.5
+
+def test_sm2_ease_has_a_floor():
+    ease = app.SRS_INITIAL_EASE
+    for _ in range(20):
+        _, ease, _, _ = app.sm2_schedule(0.0, ease, 0, 0, 0)
+    assert ease == app.SRS_MIN_EASE
+
+def test_review_store_keeps_a_schedule_per_learner(tmp_path):
+    store = app.ReviewStore(str(tmp_path / "reviews.sqlite3"))
+    deck = [HELLO, THANKS, YES]
+    now = time.time()
+    store.record("amina", app.flashcard_id(THANKS), 1, now=now - 86400)
+    store.record("amina", app.flashcard_id(HELLO), 5, now=now)
+    
+    # Overdue first, then unseen; a card reviewed well is not due yet
+    assert store.due_cards("amina", deck, 3, now=now) == [THANKS, YES]
+    # Another learner's answers don't touch this schedule
+    assert sorted(store.due_cards("omar", deck, 3, now=now)) == sorted(deck)
+
+def test_review_store_due_cards_stop_at_n(tmp_path):
+    store = app.ReviewStore(str(tmp_path / "reviews.sqlite3"))
+    deck = [(f"phrase {i}", f"عبارة {i}", "") for i in range(2000)]
+    now = time.time()
+    for card in deck[:120]:
+        store.record("amina", app.flashcard_id(card), 0, now=now - 86400)
+    assert len(store.due_cards("amina", deck, 10, now=now)) == 10
+    assert len(store.due_cards("amina", deck, 200, now=now)) == 200
+
+def test_review_store_due_query_uses_the_learner_index(tmp_path):
+    store = app.ReviewStore(str(tmp_path / "reviews.sqlite3"))
+    plan = " ".join(row[-1] for row in store._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT card_id FROM card_state WHERE learner = ? AND due <= ? ORDER BY due LIMIT 10",
+        ("amina", time.time()),
+    ))
+    assert "card_state_learner_due" in plan
+    assert "TEMP B-TREE" not in plan
+
+def test_review_store_migrates_the_shared_schedule(tmp_path):
+    path = str(tmp_path / "reviews.sqlite3")
+    conn = app.sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE reviews (id INTEGER PRIMARY KEY, card_id TEXT NOT NULL, reviewed_at REAL NOT NULL, grade INTEGER NOT NULL);
+        CREATE TABLE card_state (card_id TEXT PRIMARY KEY, due REAL NOT NULL, interval_days REAL NOT NULL,
+                                 ease REAL NOT NULL, repetitions INTEGER NOT NULL, lapses INTEGER NOT NULL);
+        CREATE INDEX card_state_due ON card_state (due);
+        INSERT INTO reviews (card_id, reviewed_at, grade) VALUES ('abc', 1, 4);
+        INSERT INTO card_state VALUES ('abc', 2, 1.0, 2.5, 1, 0);
+    """)
+    conn.close()
+    store = app.ReviewStore(path)
+    assert store._conn.execute("SELECT * FROM card_state").fetchall() == [("", "abc", 2.0, 1.0, 2.5, 1, 0)]
+    assert store._conn.execute("SELECT learner, card_id FROM reviews").fetchall() == [("", "abc")]
+    store.record("amina", "abc", 5)
+    assert store._conn.execute("SELECT COUNT(*) FROM card_state").fetchone() == (2,)
+
+def test_normalize_learner_name():
+    assert app.normalize_learner_name("  Amina   Khan ") == app.normalize_learner_name("amina khan")
+    assert app.normalize_learner_name("   ") == ""
+
+# 🎵 MP3 joining
+def frame_samples(mp3_bytes):
+    """Total samples over the audio frames, skipping a leading Info/Xing header"""
+    frames = list(app.iter_mp3_frames(mp3_bytes))
+    if frames and app.is_vbr_header_frame(mp3_bytes, *frames[0]):
+        frames = frames[1:]
+    return sum(frame.samples for _, frame in frames)
+
+def test_join_mp3_adds_the_gap_and_one_info_header():
+    backend = app.FakeBackend()
+    first, second = backend.synthesize("one", "en"), backend.synthesize("second", "en")
+    joined = app.join_mp3([first, second], gap_ms=240)
+    
+    frame = app.parse_mp3_frame_header(app.SILENT_MP3_FRAME, 0)
+    gap_samples = round(0.240 * frame.sample_rate / frame.samples) * frame.samples
+    assert frame_samples(joined) == frame_samples(first) + frame_samples(second) + gap_samples
+    assert b"Info" in joined[:frame.length]
+    assert b"TIT2" not in joined  # ID3 tags of the parts are dropped
+
+def test_mp3_joiner_rejects_data_without_frames():
+    with pytest.raises(ValueError):
+        app.Mp3Joiner().append(b"not audio")
+
+# 🔄 Deck diffs
+def test_diff_flashcards_reports_added_removed_and_changed():
+    changed = ("Yes", "أَجَل", "ajal")
+    diff = app.diff_flashcards([HELLO, THANKS, YES], [HELLO, changed, ("New", "جَدِيد", "jadid")])
+    assert diff.added == [("New", "جَدِيد", "jadid")]
+    assert diff.removed == [THANKS]
+    assert diff.changed == [(YES, changed)]
+
+def test_stale_audio_keys_keep_phrases_still_in_use():
+    # "Thank you" is removed but its Arabic lives on in another card
+    new = [HELLO, ("Thanks", THANKS[1], THANKS[2])]
+    keys = app.stale_audio_keys([HELLO, THANKS], new, app.diff_flashcards([HELLO, THANKS], new))
+    assert app.speech_audio_key(THANKS[0], "en") in keys
+    assert app.speech_audio_key(THANKS[1], "ar") not in keys
+    assert app.speech_audio_key(HELLO[0], "en") not in keys
+    assert app.combined_audio_key(THANKS[0], THANKS[1]) in keys
+    assert app.deck_playlist_key([HELLO, THANKS]) in keys
+
+def test_unchanged_deck_has_no_stale_audio():
+    deck = [HELLO, THANKS]
+    assert app.stale_audio_keys(deck, deck, app.diff_flashcards(deck, deck)) == set()
+
+def write_docx(path, lines):
+    from docx import Document
+    document = Document()
+    for line in lines:
+        document.add_paragraph(line)
+    document.save(path)
+
+def test_deck_cache_keeps_the_last_good_parse_of_a_broken_document(tmp_path):
+    first, second = str(tmp_path / "a.docx"), str(tmp_path / "b.docx")
+    write_docx(first, ["Hello : [مرحبا] : marhaba"])
+    write_docx(second, ["Thanks : [شكرا] : shukran"])
+    cache = app.ParsedDeckCache(str(tmp_path / "decks"))
+    assert len(cache.load_deck([first, second]).flashcards) == 2
+    
+    with open(second, "wb") as f:
+        f.write(b"half-saved")
+    for deck in (cache.load_deck([first, second]),
+                 app.ParsedDeckCache(str(tmp_path / "decks")).load_deck([first, second])):
+        assert [path for path, _ in deck.errors] == deck.stale == [second]
+        assert ("Thanks", "شكرا", "shukran") in deck.flashcards
+
+# 🔎 Search
+def test_fold_search_text_ignores_diacritics_and_spelling_variants():
+    assert app.fold_search_text("مَرْحَبًا") == app.fold_search_text("مرحبا")
+    assert app.fold_search_text("أهلاً") == "اهلا"
+    assert app.fold_search_text("مدرسة") == "مدرسه"
+    assert app.fold_search_text("Na‘ām") == "naam"
+
+def test_search_index_matches_prefixes_folding_and_typos():
+    index = app.SearchIndex([HELLO, THANKS, YES])
+    assert index.search("") == [0, 1, 2]
+    assert index.search("مرحبا") == [0]
+    assert index.search("than") == [1]
+    assert index.search("naam") == [2]
+    assert index.search("shukrn") == [1]
+    assert index.search("thank hello") == []
+
+# 🤝 Single-flight
+def test_single_flight_shares_one_execution():
+    flights = app.SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b"audio"
+    
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("key", work)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flights.do("key", work))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while flights.stats()["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    
+    assert results == [b"audio"] * 5
+    assert len(calls) == 1
+    assert flights.stats() == {"calls": 5, "executions": 1, "coalesced": 4, "in_flight": 0}
+
+def test_single_flight_raises_for_the_leader_and_runs_again_afterwards():
+    flights = app.SingleFlight()
+    
+    def fail():
+        raise RuntimeError("down")
+    
+    with pytest.raises(RuntimeError):
+        flights.do("key", fail)
+    assert flights.do("key", lambda: "ok") == "ok"
+
+# 🚦 Rate limiting and circuit breaking
+def test_token_bucket_rejects_once_the_burst_is_spent():
+    bucket = app.TokenBucket(rate=0.001, capacity=2)
+    assert bucket.acquire() and bucket.acquire()
+    assert not bucket.acquire()
+    assert bucket.rejected == 1
+
+def test_token_bucket_refills_over_time():
+    bucket = app.TokenBucket(rate=50, capacity=1)
+    assert bucket.acquire()
+    assert bucket.acquire(timeout=1)
+
+def test_circuit_breaker_opens_then_lets_one_trial_through():
+    breaker = app.CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half-open"
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+def test_circuit_breaker_reopens_when_the_trial_fails():
+    breaker = app.CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+def test_tts_guard_does_not_count_rate_limits_as_failures():
+    guard = app.TTSGuard(app.TokenBucket(rate=0.001, capacity=1), app.CircuitBreaker(1, 60))
+    assert guard.call(lambda: "ok") == "ok"
+    with pytest.raises(app.RateLimited):
+        guard.call(lambda: "ok")
+    assert guard.breaker.state == "closed"